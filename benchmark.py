@@ -0,0 +1,245 @@
+"""Offline retrieval and recommendation benchmark with quality-regression checks.
+
+Runs a labeled query set (query -> relevant assessment URLs) through retrieval
+and the full recommendation pipeline, and reports Recall@k, MAP@k, per-stage
+latency percentiles and memory as JSON. The default fake backends (hashed
+bag-of-words embeddings and an LLM that picks the top candidates) need no
+Ollama and give identical results on every run.
+
+    python benchmark.py --json results.json
+    python benchmark.py --baseline results.json        # fail if quality regressed
+    python benchmark.py --backend ollama --json ollama.json
+"""
+import argparse
+import copy
+import hashlib
+import json
+import re
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+stages = ("embed", "search", "lexical", "prompt", "generate", "parse")
+
+
+# Deterministic stand-in for mxbai-embed-large: hashed bag of words and word pairs
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = re.findall(r"[a-z0-9+#.]+", str(text).lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def fake_llm(prompt_value, picks=5):
+    """Recommend the first candidates of the prompt, in either prompt style"""
+    text = prompt_value.to_string()
+    ids = re.findall(r"^(A\d+) \|", text, flags=re.MULTILINE)
+    if ids:
+        items = [{"id": candidate_id, "explanation": "Top retrieved candidate"} for candidate_id in ids[:picks]]
+    else:
+        names = re.findall(r"^\s*Name: (.+)$", text, flags=re.MULTILINE)
+        urls = re.findall(r"^\s*URL: (.+)$", text, flags=re.MULTILINE)
+        items = [
+            {"name": name.strip(), "url": url.strip(), "explanation": "Top retrieved candidate"}
+            for name, url in zip(names[:picks], urls[:picks])
+        ]
+    return "```json\n" + json.dumps({"recommendations": items}) + "\n```"
+
+
+def load_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def recall_at_k(ranked, relevant, k):
+    if not relevant:
+        return 0.0
+    return len(set(ranked[:k]) & set(relevant)) / len(relevant)
+
+
+def average_precision_at_k(ranked, relevant, k):
+    relevant = set(relevant)
+    if not relevant:
+        return 0.0
+    hits = 0
+    total = 0.0
+    for i, url in enumerate(ranked[:k], 1):
+        if url in relevant:
+            hits += 1
+            total += hits / i
+    return total / min(len(relevant), k)
+
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def build_backend(backend, style, retrieval, k):
+    """Return (retriever, chain) for the chosen backend"""
+    import main
+    import vector
+    from catalog import get_catalog, get_lexical_index
+
+    retriever = vector.SHLRetriever(None, k=k, engine="numpy", df=get_catalog(), lexical=get_lexical_index(), mode=retrieval)
+    if backend == "fake":
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.runnables import RunnableLambda
+
+        embedder = FakeEmbeddings()
+        documents = [
+            vector.create_assessment_document(row, vector.assessment_id(row))
+            for _, row in get_catalog().iterrows()
+        ]
+        retriever.index = vector.NumpyVectorIndex(
+            [doc.id for doc in documents],
+            embedder.embed_documents([doc.page_content for doc in documents]),
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            embedder,
+        )
+        chain = ChatPromptTemplate.from_template(main.prompt_templates[style]) | RunnableLambda(fake_llm)
+        return retriever, chain
+
+    # Time the model itself, not the embedding cache in front of it
+    retriever.index = copy.copy(vector.get_retriever().get_index())
+    retriever.index.embedding_function = vector.get_embeddings().embedding_function
+    return retriever, main.create_chain(style)
+
+
+def run(args):
+    import main
+    from metrics import request_spans
+
+    queries = load_queries(args.queries)
+    tracemalloc.start()
+    retriever, chain = build_backend(args.backend, args.style, args.retrieval, args.k)
+
+    timings = {stage: [] for stage in stages}
+    per_query = []
+    for item in queries:
+        query = item["query"]
+        # The retriever reports its embed, search and lexical stages as timing spans
+        spans = {}
+        token = request_spans.set(spans)
+        documents = retriever.invoke(query)
+        request_spans.reset(token)
+        searched = time.perf_counter()
+        inputs, id_map = main.build_prompt_inputs(query, documents, args.style)
+        prompted = time.perf_counter()
+        completion = chain.invoke(inputs)
+        generated = time.perf_counter()
+        recommendations = main.hydrate_recommendations(main.parse_recommendations(completion, args.style), id_map)
+        parsed = time.perf_counter()
+        used_fallback = recommendations is None
+        if used_fallback:
+            recommendations = main.fallback_recommendations(documents)
+
+        spans.update(prompt=prompted - searched, generate=generated - prompted, parse=parsed - generated)
+        for stage in stages:
+            timings[stage].append(spans.get(stage, 0.0))
+
+        retrieved_urls = [doc.metadata.get("url") for doc in documents]
+        recommended_urls = [rec.get("url") for rec in recommendations.get("recommendations", [])]
+        relevant = item["relevant"]
+        per_query.append({
+            "query": query,
+            "retrieval_recall": recall_at_k(retrieved_urls, relevant, args.k),
+            "retrieval_ap": average_precision_at_k(retrieved_urls, relevant, args.k),
+            "pipeline_recall": recall_at_k(recommended_urls, relevant, args.k),
+            "pipeline_ap": average_precision_at_k(recommended_urls, relevant, args.k),
+            "fallback": used_fallback,
+            "retrieved": retrieved_urls,
+            "recommended": recommended_urls,
+        })
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    rss_divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+    def mean(key):
+        return float(np.mean([row[key] for row in per_query]))
+
+    return {
+        "config": {"backend": args.backend, "style": args.style, "retrieval": args.retrieval, "k": args.k, "queries": args.queries},
+        "retrieval": {f"recall@{args.k}": mean("retrieval_recall"), f"map@{args.k}": mean("retrieval_ap")},
+        "pipeline": {
+            f"recall@{args.k}": mean("pipeline_recall"),
+            f"map@{args.k}": mean("pipeline_ap"),
+            "fallback_rate": float(np.mean([row["fallback"] for row in per_query])),
+        },
+        "latency": {stage: percentiles(values) for stage, values in timings.items()},
+        "memory": {
+            "python_peak_mb": peak / (1024 * 1024),
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / rss_divisor,
+        },
+        "queries": per_query,
+    }
+
+
+def compare(results, baseline, max_drop):
+    """Print quality and latency deltas against a baseline run; False if quality regressed"""
+    ok = True
+    for section in ("retrieval", "pipeline"):
+        for metric, value in results[section].items():
+            if metric == "fallback_rate" or metric not in baseline.get(section, {}):
+                continue
+            delta = value - baseline[section][metric]
+            regressed = delta < -max_drop
+            ok = ok and not regressed
+            print(f"{section} {metric}: {value:.3f} ({delta:+.3f}){'  REGRESSION' if regressed else ''}")
+    for stage, stats in results["latency"].items():
+        if stage in baseline.get("latency", {}):
+            before = baseline["latency"][stage]["p50_ms"]
+            print(f"{stage} p50: {stats['p50_ms']:.2f}ms (was {before:.2f}ms)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", default="benchmark_queries.jsonl", help="labeled JSONL query set")
+    parser.add_argument("--backend", default="fake", choices=["fake", "ollama"])
+    parser.add_argument("--style", default=None, choices=["compact", "full"], help="prompt style (default: SHL_PROMPT_STYLE)")
+    parser.add_argument("--retrieval", default="hybrid", choices=["hybrid", "vector", "lexical"])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.02, help="allowed drop in any recall/MAP metric")
+    args = parser.parse_args()
+    if args.style is None:
+        import main as app
+        args.style = app.prompt_style
+
+    results = run(args)
+    print(json.dumps({key: results[key] for key in ("retrieval", "pipeline", "latency", "memory")}, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_drop):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import asyncio
+import copy
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text):
+    """Collapse whitespace and case so trivially different queries share a key"""
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+# Thread-safe LRU cache with optional time-to-live
+class LRUCache:
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# SQLite-backed vector store so cached embeddings survive restarts
+class SQLiteVectorStore:
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        vector, created = row
+        if self.ttl and created + self.ttl < time.time():
+            return None
+        return np.frombuffer(vector, dtype=np.float32).tolist()
+
+    def set(self, key, vector):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)",
+                (key, blob, time.time()),
+            )
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM embeddings")
+            self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# Embedding wrapper that checks memory, then disk, before calling the model
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embedding_function, model_name, max_entries=1024, ttl=None, disk_path=None):
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.disk = SQLiteVectorStore(disk_path, ttl=ttl) if disk_path else None
+        self.disk_hits = 0
+
+    def cache_key(self, text):
+        payload = f"{self.model_name}\0{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, key):
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self.memory.set(key, vector)
+        return vector
+
+    def store(self, key, vector):
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.set(key, vector)
+
+    def embed_query(self, text):
+        key = self.cache_key(text)
+        vector = self.lookup(key)
+        if vector is None:
+            vector = self.embedding_function.embed_query(text)
+            self.store(key, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys = [self.cache_key(text) for text in texts]
+        vectors = [self.lookup(key) for key in keys]
+        # Embed only the cache misses, in one call, keeping the first text of each duplicate key
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None and keys[i] not in missing:
+                missing[keys[i]] = texts[i]
+        if missing:
+            fresh = self.embedding_function.embed_documents(list(missing.values()))
+            fresh_by_key = dict(zip(missing.keys(), fresh))
+            for key, vector in fresh_by_key.items():
+                self.store(key, vector)
+            vectors = [vector if vector is not None else fresh_by_key[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats["model"] = self.model_name
+        stats["disk_hits"] = self.disk_hits
+        stats["disk_size"] = len(self.disk) if self.disk is not None else 0
+        # A disk hit still counts as a memory miss, so report the combined picture too
+        stats["misses"] = stats["misses"] - self.disk_hits
+        lookups = stats["hits"] + self.disk_hits + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + self.disk_hits) / lookups if lookups else 0.0
+        return stats
+
+
+# Result of a computation shared by every caller that asked for the same key
+class InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# LRU/TTL cache with single-flight de-duplication of concurrent misses
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl=None):
+        self.cache = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.async_inflight = {}
+        self.async_waiters = {}
+        self.coalesced = 0
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing it at most once at a time.
+
+        A result of None is handed to waiting callers but never stored, so
+        failed computations are retried on the next request.
+        """
+        value = self.cache.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+
+        with self.lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = InFlight()
+                self.inflight[key] = flight
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = compute()
+            if flight.result is not None:
+                self.cache.set(key, flight.result)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight.done.set()
+        return copy.deepcopy(flight.result)
+
+    async def aget_or_compute(self, key, compute):
+        """Async variant of get_or_compute; compute is a coroutine function.
+
+        The computation runs in its own task that every caller awaits through
+        a shield, so cancelling one caller, such as the one that started it,
+        does not cancel it for the others. It is cancelled once no caller is
+        left waiting. Must only be called from one event loop.
+        """
+        value = self.cache.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+
+        task = self.async_inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._acompute(key, compute))
+            # Mark a failure as retrieved even if every caller went away
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.async_inflight[key] = task
+        self.async_waiters[task] = self.async_waiters.get(task, 0) + 1
+        try:
+            return copy.deepcopy(await asyncio.shield(task))
+        finally:
+            self.async_waiters[task] -= 1
+            if not self.async_waiters[task]:
+                del self.async_waiters[task]
+                # Every caller went away, e.g. a batch whose client disconnected
+                if not task.done():
+                    task.cancel()
+                    # A caller arriving before the task unwinds starts a new computation instead of joining this one
+                    if self.async_inflight.get(key) is task:
+                        del self.async_inflight[key]
+
+    async def _acompute(self, key, compute):
+        try:
+            result = await compute()
+            if result is not None:
+                self.cache.set(key, result)
+            return result
+        finally:
+            if self.async_inflight.get(key) is asyncio.current_task():
+                del self.async_inflight[key]
+
+    def clear(self):
+        self.cache.clear()
+
+    def keys(self):
+        with self.cache.lock:
+            return list(self.cache.entries.keys())
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["in_flight"] = len(self.inflight) + len(self.async_inflight)
+        stats["coalesced"] = self.coalesced
+        return stats
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import threading
+
+import pandas as pd
+
+from components import LazyComponent
+from filters import CatalogIndex
+from lexical import BM25Index
+
+catalog_path = "shl_assessments_with_skills.csv"
+
+
+def load_catalog():
+    """Read the assessment catalog once for every consumer in the process"""
+    return pd.read_csv(catalog_path)
+
+
+# Catalog rows serialized to JSON once, so listing them only joins bytes
+class CatalogPayload:
+    """Rows are kept as one JSON fragment each, per projected field list, in
+    catalog order; `version` is a content hash, identical in every process
+    that loaded the same catalog. `index` filters the same catalog, so row
+    positions and rows never come from different versions while a snapshot
+    is being swapped in.
+    """
+
+    max_projections = 32
+
+    def __init__(self, df, index=None):
+        self.df = df
+        self.index = index if index is not None else CatalogIndex(df)
+        self.columns = list(df.columns)
+        # Missing durations are NaN, which is not valid JSON
+        self.records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+        self.lock = threading.Lock()
+        self.fragments = {}
+        self.version = hashlib.sha256(b"\n".join(self.rows())).hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.records)
+
+    def resolve_fields(self, names):
+        """Map requested field names to catalog columns, case-insensitively; raises KeyError"""
+        by_lower = {column.lower(): column for column in self.columns}
+        return [by_lower[name.strip().lower()] for name in names if name.strip()]
+
+    def rows(self, fields=None):
+        key = tuple(fields or self.columns)
+        fragments = self.fragments.get(key)
+        if fragments is None:
+            fragments = [
+                json.dumps({field: record[field] for field in key}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                for record in self.records
+            ]
+            with self.lock:
+                if len(self.fragments) < self.max_projections:
+                    self.fragments[key] = fragments
+        return fragments
+
+    def body(self, positions, fields=None, **meta):
+        """JSON document listing the given rows, plus top-level metadata keys"""
+        fragments = self.rows(fields)
+        listed = b",".join(fragments[position] for position in positions)
+        extra = b"".join(
+            b"," + json.dumps(key).encode("utf-8") + b":" + json.dumps(value).encode("utf-8")
+            for key, value in meta.items()
+        )
+        return b'{"assessments":[' + listed + b"]" + extra + b"}"
+
+
+catalog_component = LazyComponent("catalog", load_catalog)
+catalog_index_component = LazyComponent("catalog_index", lambda: CatalogIndex(get_catalog()))
+lexical_index_component = LazyComponent("lexical_index", lambda: BM25Index(get_catalog()))
+catalog_payload_component = LazyComponent("catalog_payload", lambda: CatalogPayload(get_catalog()))
+
+
+def get_catalog():
+    return catalog_component.get()
+
+
+def get_catalog_index():
+    return catalog_index_component.get()
+
+
+def get_lexical_index():
+    return lexical_index_component.get()
+
+
+def get_catalog_payload():
+    payload = catalog_payload_component.get()
+    # Serialize again only when a different catalog has been installed
+    if payload.df is not get_catalog():
+        catalog_payload_component.reset()
+        payload = catalog_payload_component.get()
+    return payload
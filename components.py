@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+# A heavy dependency that is only built when first needed, with warm-up state for readiness checks
+class LazyComponent:
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.value = None
+        self.state = "pending"
+        self.error = None
+        self.seconds = None
+        self.detail = None
+        registry[name] = self
+
+    def get(self):
+        if self.state == "ready":
+            return self.value
+        with self.lock:
+            if self.state != "ready":
+                self.state = "warming"
+                started = time.perf_counter()
+                try:
+                    self.value = self.factory()
+                except Exception as e:
+                    # Leave the component retryable on the next call
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                finally:
+                    self.seconds = time.perf_counter() - started
+                self.state = "ready"
+                self.error = None
+        return self.value
+
+    def set(self, value):
+        """Install a ready-made value, e.g. a stub in load tests"""
+        with self.lock:
+            self.value = value
+            self.state = "ready"
+            self.error = None
+
+    def reset(self):
+        with self.lock:
+            self.value = None
+            self.state = "pending"
+            self.error = None
+            self.seconds = None
+
+    def status(self):
+        status = {"state": self.state}
+        if self.seconds is not None:
+            status["seconds"] = round(self.seconds, 3)
+        if self.error:
+            status["error"] = self.error
+        if self.detail:
+            status["detail"] = self.detail
+        return status
+
+
+registry = {}
+
+
+def warm_up(names=None):
+    """Initialize components in registration order, recording failures instead of raising"""
+    for name, component in list(registry.items()):
+        if names is not None and name not in names:
+            continue
+        try:
+            component.get()
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+
+
+def readiness():
+    statuses = {name: component.status() for name, component in registry.items()}
+    ready = all(status["state"] == "ready" for status in statuses.values())
+    return ready, statuses
@@ -0,0 +1,191 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from lexical import stop_words
+
+# Names of the SHL test type letters, as shown in the catalog's Skills column
+type_skill_map = {
+    'A': 'Ability & Aptitude',
+    'B': 'Biodata and Situational Judgement',
+    'C': 'Competencies',
+    'D': 'Development & 360',
+    'E': 'Assessment Exercises',
+    'K': 'Knowledge and Skills',
+    'P': 'Personality and Behaviour',
+    'S': 'Simulations',
+}
+
+# Keywords that signal a requirement for each SHL test type letter, matched as whole words,
+# so "scalability" is not an ability test; names ending in a symbol need lookarounds instead of \b
+type_keywords = {
+    'A': r"\b(?:aptitude|abilit(?:y|ies)|cognitive|reasoning|numerical|verbal|analytical|logical)\b",
+    'B': r"\b(?:biodata|situational judge?ment|sjt)\b",
+    'C': r"\bcompetenc(?:y|ies|e)\b",
+    'D': r"\b(?:360|(?:employee|leadership) development)\b",
+    'E': r"\b(?:assessment exercises?|in-tray|role[- ]play)\b",
+    'K': r"\b(?:knowledge|technical skills?|java|python|sql|javascript|excel|coding|programming)\b|(?<!\w)(?:\.net|c#|c\+\+)(?!\w)",
+    'P': r"\b(?:personality|behaviou?r(?:al|s)?|traits?)\b",
+    'S': r"\bsimulations?\b",
+}
+type_patterns = {letter: re.compile(pattern, re.IGNORECASE) for letter, pattern in type_keywords.items()}
+explicit_type_pattern = re.compile(r"\btypes?\s*[:=]?\s*([ABCDEKPS]+)\b")
+
+minutes_pattern = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-\s*)?(?:minutes?|mins?)\b", re.IGNORECASE)
+hours_pattern = re.compile(r"(\d+(?:\.\d+)?|an|one|half an)\s*(?:-\s*)?(?:hours?|hrs?)\b", re.IGNORECASE)
+remote_pattern = re.compile(r"\bremote(?:ly)?\b|\bunproctored\b", re.IGNORECASE)
+adaptive_pattern = re.compile(r"\badaptive\b|\birt\b", re.IGNORECASE)
+# A negation up to two words before a keyword, as in "not remote", "no adaptive" or "non-adaptive"
+negation_pattern = re.compile(
+    r"(?:\b(?:not|no|without|never|don'?t|doesn'?t)\s+(?:(?!(?:but|while|whereas|however)\b)\w+\s+){0,2}|\bnon[\s-]*)$",
+    re.IGNORECASE,
+)
+# A waiver later in the same clause, as in "remote is not required" or "adaptive optional"
+waiver_pattern = re.compile(
+    r"(?:(?!\b(?:but|while|whereas|however)\b)[^,.;:!?])*?"
+    r"\b(?:not\s+(?:required|needed|necessary|essential|mandatory|a must)|(?:is|are)n'?t\s+(?:required|needed|necessary|essential|mandatory)|optional|unnecessary)\b",
+    re.IGNORECASE,
+)
+onsite_pattern = re.compile(r"\bon[- ]?site\b|\bin[- ]person\b|\bproctored in\b|\bat (?:our|the) office\b", re.IGNORECASE)
+
+word_pattern = re.compile(r"\w+")
+# Words of assessment requests that carry no requirement of their own
+filler_words = frozenset(
+    "assessment assessments test tests testing candidate candidates hire hiring hires recruit recruiting "
+    "want wants needs required require requires must should like prefer preferred please find suggest recommend "
+    "role roles position job max maximum min under less than within up most limit time duration long only "
+    "not no non without onsite site person optional needed necessary essential mandatory isn aren t but".split()
+)
+# Content words a query may have beyond its constraints and still be answered from the columns alone
+structured_max_free_words = 2
+
+
+def requires(pattern, query):
+    """True when a keyword occurs without a negation just before it or a waiver after it in its clause"""
+    return any(
+        not negation_pattern.search(query[:match.start()]) and not waiver_pattern.match(query, match.end())
+        for match in pattern.finditer(query)
+    )
+
+
+def parse_constraints(query):
+    """Pull duration limit, remote/adaptive requirements and type letters out of a query"""
+    limits = [float(value) for value in minutes_pattern.findall(query)]
+    for value in hours_pattern.findall(query):
+        value = value.lower()
+        if value in ("an", "one"):
+            limits.append(60.0)
+        elif value == "half an":
+            limits.append(30.0)
+        else:
+            limits.append(float(value) * 60)
+
+    types = set()
+    for letters in explicit_type_pattern.findall(query):
+        types.update(letters)
+    for letter, pattern in type_patterns.items():
+        if pattern.search(query):
+            types.add(letter)
+
+    return {
+        "max_duration": min(limits) if limits else None,
+        # An on-site requirement overrides any mention of remote testing
+        "remote_testing": requires(remote_pattern, query) and not onsite_pattern.search(query),
+        "adaptive_support": requires(adaptive_pattern, query),
+        "types": "".join(sorted(types)),
+    }
+
+
+def has_constraints(constraints):
+    return bool(
+        constraints["max_duration"] is not None
+        or constraints["remote_testing"]
+        or constraints["adaptive_support"]
+        or constraints["types"]
+    )
+
+
+def free_words(query):
+    """Content words of a query that no constraint pattern accounts for"""
+    for pattern in [minutes_pattern, hours_pattern, remote_pattern, adaptive_pattern, explicit_type_pattern, *type_patterns.values()]:
+        query = pattern.sub(" ", query)
+    return [
+        word for word in word_pattern.findall(query.lower())
+        if word not in stop_words and word not in filler_words and not word.isdigit()
+    ]
+
+
+def is_structured_query(query, constraints, max_words=25):
+    """True when a query is short and, apart from a few words such as a role name, fully described by column constraints"""
+    return (
+        has_constraints(constraints)
+        and len(word_pattern.findall(query)) <= max_words
+        and len(free_words(query)) <= structured_max_free_words
+    )
+
+
+# Precomputed column indexes over the catalog for constraint filtering
+class CatalogIndex:
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.size = len(self.df)
+        self.all_rows = (1 << self.size) - 1
+
+        # One bitset per test type letter, bit i set when row i has that letter
+        self.type_bits = {}
+        for i, value in enumerate(self.df["Type"].fillna("")):
+            for letter in str(value):
+                self.type_bits[letter] = self.type_bits.get(letter, 0) | (1 << i)
+
+        self.remote_bits = self.column_bits("RemoteTesting")
+        self.adaptive_bits = self.column_bits("AdaptiveSupport")
+
+        # Durations sorted ascending with prefix bitsets, so a limit is one searchsorted
+        durations = pd.to_numeric(self.df["Duration"], errors="coerce").to_numpy(dtype=float)
+        known = np.flatnonzero(~np.isnan(durations))
+        order = known[np.argsort(durations[known], kind="stable")]
+        self.sorted_durations = durations[order]
+        self.duration_prefix_bits = [0]
+        for row in order:
+            self.duration_prefix_bits.append(self.duration_prefix_bits[-1] | (1 << int(row)))
+        # Rows without a duration cannot be ruled out by a time limit
+        self.unknown_duration_bits = self.all_rows & ~self.duration_prefix_bits[-1]
+
+        self.row_by_url = {url: i for i, url in enumerate(self.df["URL"])}
+
+    def column_bits(self, column):
+        bits = 0
+        for i, value in enumerate(self.df[column]):
+            if value == "Yes":
+                bits |= 1 << i
+        return bits
+
+    def filter_bits(self, constraints):
+        bits = self.all_rows
+        if constraints["types"]:
+            type_bits = 0
+            for letter in constraints["types"]:
+                type_bits |= self.type_bits.get(letter, 0)
+            bits &= type_bits
+        if constraints["remote_testing"]:
+            bits &= self.remote_bits
+        if constraints["adaptive_support"]:
+            bits &= self.adaptive_bits
+        if constraints["max_duration"] is not None:
+            cutoff = int(np.searchsorted(self.sorted_durations, constraints["max_duration"], side="right"))
+            bits &= self.duration_prefix_bits[cutoff] | self.unknown_duration_bits
+        return bits
+
+    def filter(self, constraints):
+        """Return the catalog row positions that satisfy every constraint"""
+        return self.rows(self.filter_bits(constraints))
+
+    def rows(self, bits):
+        """Row positions of the set bits, in catalog order"""
+        rows = []
+        while bits:
+            low = bits & -bits
+            rows.append(low.bit_length() - 1)
+            bits ^= low
+        return rows
@@ -0,0 +1,81 @@
+"""Local HTTP server for the check scripts.
+
+Runs a request handler class on a free port of 127.0.0.1 in a background
+thread and counts the responses it sends by path and status, so a check can
+assert on what the code under test actually requested.
+
+    with FixtureServer(Handler) as server:
+        fetch(server.url("/page"))
+        assert server.count("/page", 304) == 1
+"""
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+# Threaded server around a BaseHTTPRequestHandler subclass that records every response status
+class FixtureServer:
+    def __init__(self, handler_class):
+        self.lock = threading.Lock()
+        self.responses = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.counting(handler_class))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def counting(self, handler_class):
+        fixtures = self
+
+        class CountingHandler(handler_class):
+            def send_response(self, code, message=None):
+                # send_error goes through here as well
+                fixtures.record(urlsplit(self.path).path, code)
+                super().send_response(code, message)
+
+            def log_message(self, format, *args):
+                pass
+
+        return CountingHandler
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def url(self, path=""):
+        return self.base_url + path
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def record(self, path, status):
+        with self.lock:
+            counts = self.responses.setdefault(path, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def count(self, path, status):
+        with self.lock:
+            return self.responses.get(path, {}).get(status, 0)
+
+    def statuses(self, prefix="/"):
+        """Response counts by status over the paths starting with prefix"""
+        totals = {}
+        with self.lock:
+            for path, counts in self.responses.items():
+                if path.startswith(prefix):
+                    for status, count in counts.items():
+                        totals[status] = totals.get(status, 0) + count
+        return totals
+
+    def reset_counts(self):
+        with self.lock:
+            self.responses = {}
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from bs4 import BeautifulSoup
+
+from cache import LRUCache
+from metrics import timed
+
+# lxml parses several times faster than the pure-Python parser; use it when installed
+try:
+    import lxml  # noqa: F401
+    html_parser = "lxml"
+except ImportError:
+    html_parser = "html.parser"
+
+max_download_bytes = int(os.environ.get("SHL_URL_MAX_BYTES", str(2 * 1024 * 1024)))
+url_cache_size = int(os.environ.get("SHL_URL_CACHE_SIZE", "256"))
+url_cache_ttl = float(os.environ.get("SHL_URL_CACHE_TTL", "3600"))
+fetch_timeout = 10
+accepted_types = ("text/html", "application/xhtml+xml", "text/plain")
+# Page chrome that never belongs to a job description
+noise_tags = ["script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside", "form", "button"]
+landmark_selectors = "main, article, [role=main]"
+content_hint = re.compile(r"job|description|posting|vacanc|requirement", re.IGNORECASE)
+min_content_chars = 200
+
+
+# A URL that could not be turned into job description text
+class IngestError(Exception):
+    def __init__(self, reason, message, status_code=422):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+
+    def to_dict(self):
+        return {"error": str(self), "reason": self.reason}
+
+
+def validate_url(url):
+    parts = urlsplit(str(url).strip())
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise IngestError("invalid_url", "URL must be an absolute http or https URL", 400)
+
+
+def content_charset(headers):
+    match = re.search(r"charset=([\w-]+)", headers.get("content-type", ""), re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def cache_max_age(headers):
+    """Seconds the response may be reused per Cache-Control, 0 for no-cache, None if unspecified"""
+    directives = headers.get("cache-control", "").lower()
+    if "no-cache" in directives:
+        return 0
+    match = re.search(r"max-age=(\d+)", directives)
+    return int(match.group(1)) if match else None
+
+
+def clean_text(text):
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
+
+
+def main_content(soup):
+    """The element most likely to hold the posting: a main/article landmark,
+    else the largest element whose id or class names a job description, else the body.
+    """
+    for element in soup.select(landmark_selectors):
+        if len(element.get_text(" ", strip=True)) >= min_content_chars:
+            return element
+    best, best_length = None, 0
+    for element in soup.find_all(lambda tag: content_hint.search(" ".join([tag.get("id") or ""] + (tag.get("class") or [])))):
+        length = len(element.get_text(" ", strip=True))
+        if length > best_length:
+            best, best_length = element, length
+    if best is not None and best_length >= min_content_chars:
+        return best
+    return soup.body or soup
+
+
+def html_to_text(markup, encoding=None):
+    """Strip markup and page chrome from a job description page"""
+    with timed("html_parse"):
+        soup = BeautifulSoup(markup, html_parser, from_encoding=encoding if isinstance(markup, bytes) else None)
+        for element in soup(noise_tags):
+            element.decompose()
+        return clean_text(main_content(soup).get_text("\n"))
+
+
+# Fetches job description pages with a size cap, caching the extracted text by URL
+class UrlIngestor:
+    """Cached text is reused for the configured TTL, or the page's Cache-Control
+    max-age; after that it is revalidated with If-None-Match/If-Modified-Since, so
+    unchanged pages are not downloaded or parsed again. Concurrent async requests
+    for the same URL share one download.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None, max_entries=None, timeout=fetch_timeout):
+        self.max_bytes = max_bytes or max_download_bytes
+        self.ttl = url_cache_ttl if ttl is None else ttl
+        self.cache = LRUCache(max_entries or url_cache_size)
+        self.timeout = timeout
+        self.inflight = {}
+        self.downloads = 0
+        self.revalidated = 0
+        self.coalesced = 0
+
+    def request_headers(self, entry):
+        headers = {"Accept": "text/html,application/xhtml+xml,text/plain;q=0.9"}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def check_response(self, status_code, headers):
+        if status_code != 200:
+            raise IngestError("http_status", f"Failed to retrieve content from URL: {status_code}", 502)
+        content_type = headers.get("content-type", "text/html").split(";")[0].strip().lower()
+        if content_type and content_type not in accepted_types:
+            raise IngestError("unsupported_content", f"Unsupported content type: {content_type}", 415)
+        length = headers.get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            raise self.too_large()
+
+    def too_large(self):
+        return IngestError("too_large", f"Page is larger than {self.max_bytes} bytes", 413)
+
+    def append_limited(self, body, chunk):
+        body.extend(chunk)
+        if len(body) > self.max_bytes:
+            raise self.too_large()
+
+    def extract(self, headers, body):
+        """Text of a downloaded page; raises IngestError if nothing readable is left"""
+        charset = content_charset(headers)
+        if headers.get("content-type", "").lower().startswith("text/plain"):
+            text = clean_text(body.decode(charset or "utf-8", errors="replace"))
+        else:
+            text = html_to_text(body, charset)
+        if not text:
+            raise IngestError("empty", "No readable text found at URL", 422)
+        return text
+
+    def store(self, url, headers, text):
+        self.downloads += 1
+        if "no-store" in headers.get("cache-control", "").lower():
+            return text
+        max_age = cache_max_age(headers)
+        ttl = self.ttl if max_age is None else min(max_age, self.ttl)
+        entry = {
+            "text": text,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "expires": time.monotonic() + ttl,
+        }
+        # A stale entry is only useful if the server can confirm it is unchanged
+        if ttl > 0 or entry["etag"] or entry["last_modified"]:
+            self.cache.set(url, entry)
+        return text
+
+    def revalidate(self, url, entry, headers):
+        max_age = cache_max_age(headers)
+        entry["expires"] = time.monotonic() + (self.ttl if max_age is None else min(max_age, self.ttl))
+        self.revalidated += 1
+        self.cache.set(url, entry)
+        return entry["text"]
+
+    def cached(self, url):
+        """Return (entry, fresh) for a URL"""
+        validate_url(url)
+        entry = self.cache.get(url)
+        return entry, entry is not None and entry["expires"] > time.monotonic()
+
+    def fetch(self, url, session=None):
+        """Text of the job description at url; raises IngestError"""
+        entry, fresh = self.cached(url)
+        if fresh:
+            return entry["text"]
+        try:
+            with timed("url_fetch"):
+                with (session or requests).get(url, headers=self.request_headers(entry), timeout=self.timeout, stream=True) as response:
+                    if response.status_code == 304 and entry is not None:
+                        return self.revalidate(url, entry, response.headers)
+                    self.check_response(response.status_code, response.headers)
+                    body = bytearray()
+                    for chunk in response.iter_content(64 * 1024):
+                        self.append_limited(body, chunk)
+        except requests.RequestException as e:
+            raise IngestError("fetch_failed", f"Error processing URL: {e}", 502) from e
+        return self.store(url, response.headers, self.extract(response.headers, bytes(body)))
+
+    async def afetch(self, url, client, run_blocking=None):
+        """Async variant of fetch; run_blocking(fn, *args) runs parsing off the event loop.
+
+        The download runs in its own task that every caller awaits through a
+        shield, so cancelling one caller does not cancel it for the others.
+        """
+        entry, fresh = self.cached(url)
+        if fresh:
+            return entry["text"]
+
+        task = self.inflight.get(url)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._afetch(url, entry, client, run_blocking))
+            # Mark a failure as retrieved even if every caller went away
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.inflight[url] = task
+        return await asyncio.shield(task)
+
+    async def _afetch(self, url, entry, client, run_blocking):
+        try:
+            return await self._adownload(url, entry, client, run_blocking)
+        finally:
+            del self.inflight[url]
+
+    async def _adownload(self, url, entry, client, run_blocking):
+        try:
+            with timed("url_fetch"):
+                async with client.stream("GET", url, headers=self.request_headers(entry), timeout=self.timeout) as response:
+                    if response.status_code == 304 and entry is not None:
+                        return self.revalidate(url, entry, response.headers)
+                    self.check_response(response.status_code, response.headers)
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        self.append_limited(body, chunk)
+        except httpx.HTTPError as e:
+            raise IngestError("fetch_failed", f"Error processing URL: {e}", 502) from e
+        if run_blocking is None:
+            text = self.extract(response.headers, bytes(body))
+        else:
+            text = await run_blocking(self.extract, response.headers, bytes(body))
+        return self.store(url, response.headers, text)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["downloads"] = self.downloads
+        stats["revalidated"] = self.revalidated
+        stats["coalesced"] = self.coalesced
+        stats["parser"] = html_parser
+        return stats
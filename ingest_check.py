@@ -0,0 +1,167 @@
+"""Check job description URL ingestion against a local HTTP server.
+
+Serves a handful of pages from memory and runs them through both
+UrlIngestor.fetch and UrlIngestor.afetch:
+
+- an expired page with an ETag must be revalidated with a 304 and not
+  downloaded again;
+- pages over the size cap, with or without Content-Length, fail with 413;
+- an unsupported content type fails with 415 and a 404 with 502;
+- a page with nothing but page chrome fails with 422;
+- concurrent async requests for one URL share a single download, even when
+  the caller that started it is cancelled.
+
+Exits 1 when any expectation is not met.
+
+    python ingest_check.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler
+
+import httpx
+
+from fixture_server import FixtureServer
+from ingest import IngestError, UrlIngestor
+
+max_bytes = 4096
+job_text = "Senior Java developer. " * 20
+pages = {
+    "/job": ("text/html; charset=utf-8", f"<html><body><nav>Menu</nav><main><p>{job_text}</p></main></body></html>"),
+    "/large": ("text/html", "<p>" + "x" * (4 * max_bytes) + "</p>"),
+    "/large-chunked": ("text/html", "<p>" + "x" * (4 * max_bytes) + "</p>"),
+    "/pdf": ("application/pdf", "%PDF-1.4"),
+    "/empty": ("text/html", "<html><head><script>track()</script></head><body><nav>Home | Jobs</nav></body></html>"),
+    "/slow": ("text/plain", job_text),
+}
+# Seconds /slow waits before answering, long enough for the other callers to join
+slow_delay = 0.3
+
+
+# Serves the pages above with ETags
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in pages:
+            self.send_error(404)
+            return
+        content_type, text = pages[self.path]
+        body = text.encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        if self.path == "/slow":
+            time.sleep(slow_delay)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        # Without a length the body runs to the end of the connection, so only the read limit applies
+        if self.path != "/large-chunked":
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients stop reading oversized pages, and cancelled downloads hang up
+            pass
+
+
+def outcome(fetch, url):
+    """(status code, reason, text) of one fetch; 200 and no reason on success"""
+    try:
+        return 200, None, fetch(url)
+    except IngestError as e:
+        return e.status_code, e.reason, None
+
+
+async def aoutcome(ingestor, client, url):
+    try:
+        return 200, None, await ingestor.afetch(url, client)
+    except IngestError as e:
+        return e.status_code, e.reason, None
+
+
+error_cases = [
+    ("/large", 413, "too_large"),
+    ("/large-chunked", 413, "too_large"),
+    ("/pdf", 415, "unsupported_content"),
+    ("/missing", 502, "http_status"),
+    ("/empty", 422, "empty"),
+]
+
+
+def check_sync(server, expect):
+    # Entries expire at once, so every later fetch has to revalidate
+    ingestor = UrlIngestor(max_bytes=max_bytes, ttl=0)
+    status, _, text = outcome(ingestor.fetch, server.url("/job"))
+    expect(status == 200 and job_text.strip() in text and "Menu" not in text, f"sync /job: {status} {text!r:.80}")
+    status, _, again = outcome(ingestor.fetch, server.url("/job"))
+    expect(again == text, "sync /job: revalidated text differs")
+    expect(server.count("/job", 304) == 1, f"sync /job: {server.count('/job', 304)} revalidations on the server")
+    stats = ingestor.stats()
+    expect((stats["downloads"], stats["revalidated"]) == (1, 1), f"sync /job: downloads/revalidated {stats['downloads']}/{stats['revalidated']}")
+    for path, code, reason in error_cases:
+        status, got, _ = outcome(ingestor.fetch, server.url(path))
+        expect((status, got) == (code, reason), f"sync {path}: {status} {got}")
+    return stats
+
+
+async def check_async(server, expect):
+    ingestor = UrlIngestor(max_bytes=max_bytes, ttl=0)
+    async with httpx.AsyncClient() as client:
+        await ingestor.afetch(server.url("/job"), client)
+        await ingestor.afetch(server.url("/job"), client)
+        expect(server.count("/job", 304) == 2, "async /job: not revalidated with a 304")
+        for path, code, reason in error_cases:
+            status, got, _ = await aoutcome(ingestor, client, server.url(path))
+            expect((status, got) == (code, reason), f"async {path}: {status} {got}")
+
+        # The first caller goes away mid-download; the others must still get the text
+        callers = [asyncio.create_task(aoutcome(ingestor, client, server.url("/slow"))) for _ in range(5)]
+        await asyncio.sleep(slow_delay / 3)
+        callers[0].cancel()
+        results = await asyncio.gather(*callers[1:], return_exceptions=True)
+    expect(all(isinstance(result, tuple) and result[0] == 200 for result in results), f"async /slow: {results}")
+    expect(server.count("/slow", 200) == 1, f"async /slow: downloaded {server.count('/slow', 200)} times")
+    stats = ingestor.stats()
+    expect(stats["coalesced"] == 4, f"async /slow: {stats['coalesced']} coalesced requests")
+    expect(not ingestor.inflight, "async /slow: download left in flight")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    server = FixtureServer(FixtureHandler).start()
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    try:
+        sync_stats = check_sync(server, expect)
+        async_stats = asyncio.run(check_async(server, expect))
+    finally:
+        server.stop()
+
+    keys = ("downloads", "revalidated", "coalesced")
+    print(json.dumps({
+        "sync": {key: sync_stats[key] for key in keys},
+        "async": {key: async_stats[key] for key in keys},
+        "server": server.responses,
+        "failures": failures,
+    }, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Keeps technology names such as "c++", "c#", ".net" and "node.js" as single tokens
+token_pattern = re.compile(r"\.?[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+stop_words = frozenset(
+    "a an and are as at be by can for from has have i in is it its looking need of on or our "
+    "that the their this to we who will with you your".split()
+)
+# A term in the name counts more than one in the skills, which counts more than one in the description
+field_weights = {"Name": 3.0, "Skills": 2.0, "Description": 1.0}
+
+
+def tokenize(text):
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return []
+    return [token for token in token_pattern.findall(str(text).lower()) if token not in stop_words]
+
+
+# BM25 inverted index over weighted catalog fields
+class BM25Index:
+    """Postings hold row positions and the precomputed BM25 weight of the term in
+    each row, so scoring a query is one vectorized add per query term.
+    """
+
+    def __init__(self, df, k1=1.2, b=0.75, fields=None):
+        fields = fields or field_weights
+        self.size = len(df)
+        self.urls = df["URL"].tolist() if "URL" in df else [None] * self.size
+        term_counts = []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for position, (_, row) in enumerate(df.iterrows()):
+            counts = {}
+            for field, weight in fields.items():
+                for token in tokenize(row.get(field)):
+                    counts[token] = counts.get(token, 0.0) + weight
+            term_counts.append(counts)
+            lengths[position] = sum(counts.values())
+        average_length = float(lengths.mean()) if self.size else 0.0
+
+        entries = {}
+        for position, counts in enumerate(term_counts):
+            for term, frequency in counts.items():
+                entries.setdefault(term, []).append((position, frequency))
+
+        self.postings = {}
+        for term, rows_and_frequencies in entries.items():
+            rows = np.array([row for row, _ in rows_and_frequencies], dtype=np.int32)
+            frequencies = np.array([frequency for _, frequency in rows_and_frequencies], dtype=np.float32)
+            idf = np.log(1.0 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[rows] / (average_length or 1.0))
+            self.postings[term] = (rows, (idf * frequencies * (k1 + 1.0) / (frequencies + norm)).astype(np.float32))
+
+    def __len__(self):
+        return self.size
+
+    def score_all(self, query):
+        """BM25 score of every catalog row; each distinct query term counts once"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+    def search(self, query, k=10):
+        """Return (row position, score) pairs of the best matching rows, skipping rows with no matching term"""
+        scores = self.score_all(query)
+        matched = np.flatnonzero(scores)
+        order = matched[np.argsort(-scores[matched], kind="stable")][:k]
+        return [(int(row), float(scores[row])) for row in order]
+
+    def scores_by_url(self, query):
+        scores = self.score_all(query)
+        return {self.urls[row]: float(scores[row]) for row in np.flatnonzero(scores)}
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+
+from metrics import record
+
+
+# No LLM answer could be obtained in time; callers fall back to the retrieval-only answer
+class LLMUnavailable(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+# One LLM endpoint with its own concurrency limit and health state
+class LLMBackend:
+    def __init__(self, name, runnable, max_concurrency=2):
+        self.name = name
+        self.runnable = runnable
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.unhealthy_until = 0.0
+
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def status(self):
+        return {
+            "name": self.name,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "healthy": self.healthy(),
+        }
+
+
+# Routes LLM calls to the least busy backend, with a bounded wait queue and a per-call deadline
+class LLMPool:
+    """Exposes invoke, ainvoke and astream like the chain it replaces.
+
+    A call waits for a free slot on any backend, at most `max_queue` calls wait
+    at once, and the whole call, queueing included, must finish within
+    `timeout` seconds. A backend that raises is skipped for `cooldown` seconds
+    and the call is retried on the next one.
+    """
+
+    def __init__(self, backends, timeout=60.0, max_queue=16, cooldown=5.0):
+        self.backends = list(backends)
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.rejected = 0
+        self.condition = None
+        self.condition_loop = None
+
+    def pick(self, exclude=(), require_capacity=True):
+        """The backend with the fewest outstanding calls, healthy ones first"""
+        candidates = [
+            backend for backend in self.backends
+            if backend not in exclude and (not require_capacity or backend.outstanding < backend.max_concurrency)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda backend: (not backend.healthy(), backend.outstanding))
+
+    def take(self, exclude=(), require_capacity=True):
+        with self.lock:
+            backend = self.pick(exclude, require_capacity)
+            if backend is not None:
+                backend.outstanding += 1
+                backend.calls += 1
+            return backend
+
+    def release(self, backend):
+        with self.lock:
+            backend.outstanding -= 1
+
+    def mark_failed(self, backend, error):
+        print(f"LLM backend {backend.name} failed: {str(error)[:200]}")
+        backend.failures += 1
+        backend.unhealthy_until = time.monotonic() + self.cooldown
+
+    def get_condition(self):
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self.condition is None or self.condition_loop is not loop:
+            self.condition = asyncio.Condition()
+            self.condition_loop = loop
+        return self.condition
+
+    async def acquire(self, deadline, exclude=()):
+        queued = time.perf_counter()
+        backend = self.take(exclude)
+        if backend is None:
+            with self.lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise LLMUnavailable("queue_full", f"{self.waiting} LLM calls are already waiting")
+                self.waiting += 1
+            try:
+                condition = self.get_condition()
+                async with condition:
+                    backend = await asyncio.wait_for(
+                        condition.wait_for(lambda: self.take(exclude)),
+                        deadline - time.monotonic(),
+                    )
+            except asyncio.TimeoutError:
+                raise LLMUnavailable("timeout", f"No LLM backend became free within {self.timeout}s") from None
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+        record("llm_queue", time.perf_counter() - queued)
+        return backend
+
+    async def arelease(self, backend):
+        self.release(backend)
+        condition = self.get_condition()
+        async with condition:
+            condition.notify_all()
+
+    async def ainvoke(self, inputs):
+        deadline = time.monotonic() + self.timeout
+        tried = []
+        while True:
+            backend = await self.acquire(deadline, tried)
+            started = time.perf_counter()
+            try:
+                return await asyncio.wait_for(backend.runnable.ainvoke(inputs), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                backend.timeouts += 1
+                raise LLMUnavailable("timeout", f"No answer from {backend.name} within {self.timeout}s") from None
+            except Exception as e:
+                self.mark_failed(backend, e)
+                tried.append(backend)
+                if len(tried) >= len(self.backends) or time.monotonic() >= deadline:
+                    raise LLMUnavailable("backend_error", str(e)) from e
+            finally:
+                record("llm", time.perf_counter() - started)
+                await self.arelease(backend)
+
+    async def astream(self, inputs):
+        """Stream from one backend; the deadline covers the whole answer.
+
+        A backend that fails before its first chunk is retried on the next one,
+        as in ainvoke; once chunks have been yielded the answer cannot be restarted.
+        """
+        deadline = time.monotonic() + self.timeout
+        tried = []
+        while True:
+            backend = await self.acquire(deadline, tried)
+            started = time.perf_counter()
+            iterator = backend.runnable.astream(inputs).__aiter__()
+            yielded = False
+            retry = False
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        backend.timeouts += 1
+                        raise LLMUnavailable("timeout", f"No complete answer from {backend.name} within {self.timeout}s") from None
+                    except Exception as e:
+                        self.mark_failed(backend, e)
+                        tried.append(backend)
+                        if yielded or len(tried) >= len(self.backends) or time.monotonic() >= deadline:
+                            raise LLMUnavailable("backend_error", str(e)) from e
+                        retry = True
+                        break
+                    yielded = True
+                    yield chunk
+            finally:
+                # Closing the backend stream releases its HTTP connection when the client goes away
+                if hasattr(iterator, "aclose"):
+                    try:
+                        await iterator.aclose()
+                    except Exception:
+                        pass
+                record("llm", time.perf_counter() - started)
+                await self.arelease(backend)
+            if not retry:
+                return
+
+    def invoke(self, inputs):
+        """Blocking call for the CLI; deadlines come from each backend's HTTP timeout"""
+        tried = []
+        while True:
+            backend = self.take(tried, require_capacity=False)
+            started = time.perf_counter()
+            try:
+                return backend.runnable.invoke(inputs)
+            except Exception as e:
+                self.mark_failed(backend, e)
+                tried.append(backend)
+                if len(tried) >= len(self.backends):
+                    raise LLMUnavailable("backend_error", str(e)) from e
+            finally:
+                record("llm", time.perf_counter() - started)
+                self.release(backend)
+
+    def stats(self):
+        return {
+            "backends": [backend.status() for backend in self.backends],
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "timeout": self.timeout,
+        }
@@ -0,0 +1,153 @@
+"""Check LLM pool routing, deadlines and the queue limit against stub hosts.
+
+Starts healthy, slow and failing stub Ollama hosts (stub_llm_server.py)
+in-process, builds the server's LLM pool for them with main.create_chain and
+asks it for recommendations over a few catalog rows:
+
+- with a failing and a healthy host, every call, blocking or streamed, must be
+  answered by the healthy host after the failing one errors;
+- a host slower than the deadline must end the call with llm_timeout, so the
+  caller falls back to the retrieved candidates, within the deadline;
+- calls beyond the pool's concurrency and `max_queue` must be rejected at once
+  with llm_queue_full, while the queued ones are still answered.
+
+Exits 1 when any expectation is not met.
+
+    python llm_pool_check.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("SHL_WARMUP", "0")
+# The stubs answer with the short candidate ids of the compact prompt
+os.environ["SHL_PROMPT_STYLE"] = "compact"
+
+import pandas as pd
+
+import catalog
+import main
+from fixture_server import FixtureServer
+from llm_pool import LLMUnavailable
+from metrics import fallback_total
+from stub_llm_server import make_handler, stub_options
+from vector import assessment_id, create_assessment_document
+
+query = "Java developer who can work with SQL"
+calls = 4
+slow_delay = 2.0
+deadline = 0.5
+
+
+def candidates(count=5):
+    df = pd.read_csv(catalog.catalog_path).head(count)
+    return [create_assessment_document(row, assessment_id(row)) for _, row in df.iterrows()]
+
+
+def make_pool(hosts, concurrency=2, timeout=10.0, max_queue=16, cooldown=None):
+    """The server's LLM pool for the given hosts, installed as the shared chain"""
+    main.llm_hosts, main.llm_concurrency, main.llm_timeout, main.llm_max_queue = hosts, concurrency, timeout, max_queue
+    pool = main.create_chain()
+    if cooldown is not None:
+        pool.cooldown = cooldown
+    main.chain_component.set(pool)
+    return pool
+
+
+def fallbacks(reason):
+    with fallback_total.lock:
+        return fallback_total.values.get((reason,), 0)
+
+
+async def stream_answer(pool, assessments):
+    """Streamed recommendations, or None when the server would fall back"""
+    inputs, id_map = main.build_prompt_inputs(query, assessments)
+    try:
+        text = "".join([chunk async for chunk in pool.astream(inputs)])
+    except LLMUnavailable as e:
+        return main.llm_unavailable(e)
+    return main.hydrate_recommendations(main.parse_recommendations(text), id_map)
+
+
+async def check_routing(expect, assessments):
+    failing = FixtureServer(make_handler(stub_options(fail_rate=1.0))).start()
+    healthy = FixtureServer(make_handler(stub_options())).start()
+    try:
+        # Without a cooldown the failing host is tried first on every call
+        pool = make_pool([failing.base_url, healthy.base_url], cooldown=0.0)
+        answers = [await main.agenerate_recommendations(query, assessments) for _ in range(calls)]
+        streamed = [await stream_answer(pool, assessments) for _ in range(calls)]
+    finally:
+        failing.stop()
+        healthy.stop()
+    expect(all(answers), f"routing: {sum(answer is None for answer in answers)} blocking calls fell back")
+    expect(all(streamed), f"routing: {sum(answer is None for answer in streamed)} streamed calls fell back")
+    expect(failing.count("/api/generate", 500) == 2 * calls, f"routing: failing host answered {failing.statuses()}")
+    expect(healthy.count("/api/generate", 200) == 2 * calls, f"routing: healthy host answered {healthy.statuses()}")
+    expect(all(backend["outstanding"] == 0 for backend in pool.stats()["backends"]), "routing: backend slots left taken")
+    return {"failing": failing.statuses(), "healthy": healthy.statuses()}
+
+
+async def check_deadline(expect, assessments):
+    slow = FixtureServer(make_handler(stub_options(delay=slow_delay))).start()
+    try:
+        make_pool([slow.base_url], timeout=deadline)
+        before = fallbacks("llm_timeout")
+        started = time.perf_counter()
+        answer = await main.agenerate_recommendations(query, assessments)
+        elapsed = time.perf_counter() - started
+    finally:
+        slow.stop()
+    expect(answer is None, "deadline: the slow host's answer was used")
+    expect(fallbacks("llm_timeout") - before == 1, "deadline: no llm_timeout fallback counted")
+    expect(elapsed < deadline + 0.5, f"deadline: call took {elapsed:.2f}s with a {deadline}s deadline")
+    return {"seconds": round(elapsed, 3)}
+
+
+async def check_queue(expect, assessments):
+    slow = FixtureServer(make_handler(stub_options(delay=0.5))).start()
+    concurrency, max_queue, rejected = 1, 2, 2
+    try:
+        pool = make_pool([slow.base_url], concurrency=concurrency, max_queue=max_queue)
+        before = fallbacks("llm_queue_full")
+        answers = await asyncio.gather(*[
+            main.agenerate_recommendations(query, assessments)
+            for _ in range(concurrency + max_queue + rejected)
+        ])
+    finally:
+        slow.stop()
+    expect(fallbacks("llm_queue_full") - before == rejected, f"queue: {fallbacks('llm_queue_full') - before} llm_queue_full fallbacks")
+    expect(sum(answer is not None for answer in answers) == concurrency + max_queue, f"queue: {sum(answer is not None for answer in answers)} answered")
+    expect(pool.stats()["rejected"] == rejected and pool.stats()["waiting"] == 0, f"queue: pool stats {pool.stats()}")
+    return {"answered": sum(answer is not None for answer in answers), "rejected": pool.stats()["rejected"]}
+
+
+async def run_checks(expect):
+    assessments = candidates()
+    return {
+        "routing": await check_routing(expect, assessments),
+        "deadline": await check_deadline(expect, assessments),
+        "queue": await check_queue(expect, assessments),
+    }
+
+
+def main_check():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    results = asyncio.run(run_checks(expect))
+    print(json.dumps({**results, "failures": failures}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_check()
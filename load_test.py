@@ -0,0 +1,114 @@
+"""Check that cheap endpoints stay responsive while LLM calls are in flight.
+
+Measures /api/assessments latency on an idle server, then again while a burst
+of /api/recommend requests is running, and fails if p99 degrades by more than
+--max-ratio.
+
+    python load_test.py --base-url http://localhost:8000
+    python load_test.py --in-process --simulate-llm 2.0
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+import numpy as np
+
+
+def percentiles(samples):
+    values = np.array(samples) * 1000
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+
+async def probe(client, path, count, interval):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def recommend(client, i):
+    # A distinct query per request so the response cache cannot answer it
+    response = await client.get("/api/recommend", params={"query": f"Java developer with SQL skills #{i}"})
+    return response.status_code
+
+
+def simulate_llm(app_module, delay):
+    """Swap the LLM backends for a stub that sleeps like a slow generation"""
+    from langchain_core.runnables import RunnableLambda
+    from llm_pool import LLMPool, LLMBackend
+
+    answer = '{"recommendations": []}'
+
+    def slow(_):
+        time.sleep(delay)
+        return answer
+
+    async def aslow(_):
+        await asyncio.sleep(delay)
+        return answer
+
+    stub = LLMBackend("stub", RunnableLambda(slow, afunc=aslow), app_module.llm_concurrency)
+    app_module.chain_component.set(LLMPool([stub], timeout=app_module.llm_timeout, max_queue=app_module.llm_max_queue))
+
+
+async def run(args):
+    if args.in_process:
+        import main
+
+        if args.simulate_llm:
+            simulate_llm(main, args.simulate_llm)
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.lifespan(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+                return await measure(client, args)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        return await measure(client, args)
+
+
+async def measure(client, args):
+    baseline = await probe(client, "/api/assessments", args.probes, args.interval)
+
+    load = [asyncio.create_task(recommend(client, i)) for i in range(args.concurrency)]
+    await asyncio.sleep(args.interval)
+    under_load = await probe(client, "/api/assessments", args.probes, args.interval)
+    in_flight_at_end = sum(1 for task in load if not task.done())
+    statuses = await asyncio.gather(*load)
+
+    before = percentiles(baseline)
+    after = percentiles(under_load)
+    print(f"/api/assessments idle:       p50={before['p50']:.1f}ms p95={before['p95']:.1f}ms p99={before['p99']:.1f}ms")
+    print(f"/api/assessments under load: p50={after['p50']:.1f}ms p95={after['p95']:.1f}ms p99={after['p99']:.1f}ms")
+    print(f"{args.concurrency} /api/recommend requests, {in_flight_at_end} still in flight after probing, statuses {sorted(set(statuses))}")
+
+    ratio = after["p99"] / max(before["p99"], args.floor_ms)
+    print(f"p99 ratio: {ratio:.2f} (limit {args.max_ratio})")
+    return ratio <= args.max_ratio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="drive main.app directly instead of a running server")
+    parser.add_argument("--simulate-llm", type=float, default=0.0, help="replace the LLM with a stub taking this many seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent /api/recommend requests")
+    parser.add_argument("--probes", type=int, default=50, help="number of /api/assessments samples per phase")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between probes")
+    parser.add_argument("--max-ratio", type=float, default=3.0, help="allowed p99 growth under load")
+    parser.add_argument("--floor-ms", type=float, default=5.0, help="minimum idle p99 used for the ratio")
+    args = parser.parse_args()
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
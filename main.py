@@ -1,29 +1,113 @@
-from langchain_ollama.llms import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
-from vector import retriever
-from fastapi import FastAPI, Query, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from vector import get_retriever, get_embeddings, embeddings_component, create_assessment_document, assessment_id
+from catalog import get_catalog_index, get_catalog_payload
+from components import LazyComponent, warm_up, readiness
+from cache import LRUCache, ResponseCache, normalize_text
+from streaming import RecommendationStreamParser, format_event
+from filters import parse_constraints, is_structured_query
+from prompting import compact_candidates, rehydrate
+from metrics import Callback, TimingMiddleware, timed, fallback_total, llm_answers_total, llm_items_dropped_total, render
+from ingest import UrlIngestor, IngestError
+from llm_pool import LLMPool, LLMBackend, LLMUnavailable
+from structured import parse_answer, validate_item, answer_schema
+from snapshot import SnapshotStore, snapshot_root
+from fastapi import APIRouter, FastAPI, Query, Request, Body
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
 import pandas as pd
 import json
-import requests
-from bs4 import BeautifulSoup
-import re
+import gzip
+import httpx
+import asyncio
+import contextlib
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import os
+import hashlib
+import hmac
+import argparse
+import time
+import threading
 from typing import List, Dict, Any, Optional
 from fastapi.middleware.cors import CORSMiddleware
 
-# Initialize FastAPI
-app = FastAPI(title="SHL Assessment Recommendation System")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Async request path limits: pooled URL fetches and a bounded vector-search pool
+http_max_connections = int(os.environ.get("SHL_HTTP_MAX_CONNECTIONS", "20"))
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SHL_RETRIEVAL_WORKERS", "4")),
+    thread_name_prefix="retrieval",
 )
+http_client = None
+
+def run_in_retrieval_pool(fn, *args):
+    """Run blocking work in the retrieval pool, keeping the request's timing context"""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(retrieval_executor, functools.partial(context.run, fn, *args))
+
+# Report per-stage durations of each request in a Server-Timing response header
+server_timing_enabled = os.environ.get("SHL_SERVER_TIMING", "0") == "1"
+
+# Warm components up in the background at startup so the first request does not pay for it
+warmup_on_startup = os.environ.get("SHL_WARMUP", "1") != "0"
+started_at = time.time()
+
+def warm_up_application():
+    warm_up()
+    retriever = get_retriever()
+    if retriever.engine == "numpy":
+        retriever.get_index()
+
+# Serve the catalog and embedding matrix from published snapshots, polling for new versions
+snapshot_store = SnapshotStore(snapshot_root) if snapshot_root else None
+snapshot_poll_seconds = float(os.environ.get("SHL_SNAPSHOT_POLL", "5"))
+
+def install_snapshot():
+    """Install the published snapshot if it changed; answers cached for the old one are dropped"""
+    version = snapshot_store.reload_if_changed()
+    if version is not None:
+        response_cache.clear()
+    return version
+
+async def watch_snapshots():
+    while True:
+        await asyncio.sleep(snapshot_poll_seconds)
+        try:
+            # Loading runs next to request handling; requests keep the objects they already hold
+            await run_in_retrieval_pool(install_snapshot)
+        except Exception as e:
+            print(f"Error reloading snapshot: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_client
+    snapshot_watcher = None
+    if snapshot_store is not None:
+        try:
+            if await run_in_retrieval_pool(install_snapshot) is None:
+                print(f"No snapshot published in {snapshot_store.root}, using the vector store")
+        except Exception as e:
+            print(f"Error loading snapshot: {e}")
+        snapshot_watcher = asyncio.create_task(watch_snapshots())
+    if warmup_on_startup:
+        threading.Thread(target=warm_up_application, name="warm-up", daemon=True).start()
+    http_client = httpx.AsyncClient(
+        timeout=10,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=http_max_connections,
+            max_keepalive_connections=http_max_connections,
+        ),
+    )
+    yield
+    if snapshot_watcher is not None:
+        snapshot_watcher.cancel()
+    await http_client.aclose()
+    http_client = None
+
+router = APIRouter()
 
 # Setup templates
 templates_dir = os.path.join(os.path.dirname(__file__), "templates")
@@ -31,13 +115,24 @@ if not os.path.exists(templates_dir):
     os.makedirs(templates_dir)
 templates = Jinja2Templates(directory=templates_dir)
 
-# Load assessment data for direct access
-assessments_df = pd.read_csv("shl_assessments_with_skills.csv")
+# "llm" always generates, "fast" answers from column filters and vector scores only,
+# "auto" uses the fast path for short constraint-only queries and the LLM otherwise
+recommend_modes = ("llm", "fast", "auto")
+auto_max_words = int(os.environ.get("SHL_AUTO_MAX_WORDS", "25"))
 
-# Initialize LLM with specific temperature for better deterministic results
-model = OllamaLLM(model="llama3.2", temperature=0.2)
+# Batch requests are retrieved in chunks, each with one embedding call and one matrix search
+batch_chunk_size = int(os.environ.get("SHL_BATCH_CHUNK_SIZE", "64"))
+batch_max_queries = int(os.environ.get("SHL_BATCH_MAX_QUERIES", "1000"))
+
+llm_model_name = "llama3.2"
+# Ollama hosts shared by least-outstanding routing; empty means the local default
+llm_hosts = [host.strip() for host in os.environ.get("SHL_LLM_HOSTS", "").split(",") if host.strip()]
+llm_concurrency = int(os.environ.get("SHL_LLM_CONCURRENCY", "2"))
+llm_timeout = float(os.environ.get("SHL_LLM_TIMEOUT", "60"))
+llm_max_queue = int(os.environ.get("SHL_LLM_MAX_QUEUE", "16"))
+# Constrain generation to the answer's JSON schema; Ollama before 0.5 only understands free text
+structured_output = os.environ.get("SHL_STRUCTURED_OUTPUT", "1") != "0"
 
-# Create improved prompt template with clear structure
 # Create improved prompt template with clear structure
 template = """
 You are an expert consultant who specializes in recommending SHL assessments for hiring managers.
@@ -72,129 +167,617 @@ Limit the recommendations to a maximum of 10, minimum of 1.
 Your response MUST be a valid, parseable JSON object exactly as specified above.
 """
 
-prompt = ChatPromptTemplate.from_template(template)
-chain = prompt | model
+# Compact prompt: short candidate ids, no URLs or repeated fields, the server fills in the details
+compact_template = """
+You are an expert consultant who recommends SHL assessments for hiring managers.
+
+Candidate assessments, one per line as: id | name | type letters | remote testing | adaptive support | minutes | description
+{assessments}
+
+Query: {query}
+
+Pick the assessments that best fit the skills, experience level and any time limit in the query,
+most relevant first, between 1 and 10 of them.
+Respond with only this JSON object, using the candidate ids:
+{{"recommendations": [{{"id": "A1", "explanation": "Brief reason this assessment fits"}}]}}
+"""
+
+# "compact" sends token-budgeted candidate lines, "full" sends every document's page_content
+prompt_style = os.environ.get("SHL_PROMPT_STYLE", "compact")
+prompt_token_budget = int(os.environ.get("SHL_PROMPT_TOKEN_BUDGET", "1200"))
+prompt_description_chars = int(os.environ.get("SHL_PROMPT_DESCRIPTION_CHARS", "200"))
+prompt_templates = {"full": template, "compact": compact_template}
+
+def create_llm(base_url=None):
+    from langchain_ollama.llms import OllamaLLM
+    kwargs = {"base_url": base_url} if base_url else {}
+    # Initialize LLM with specific temperature for better deterministic results
+    return OllamaLLM(model=llm_model_name, temperature=0.2, client_kwargs={"timeout": llm_timeout}, **kwargs)
+
+def create_chain(style=None):
+    """The prompt in front of every configured Ollama host, behind one LLM pool"""
+    from langchain_core.prompts import ChatPromptTemplate
+    style = style or prompt_style
+    prompt = ChatPromptTemplate.from_template(prompt_templates[style])
+    backends = []
+    for host in llm_hosts or [None]:
+        llm = create_llm(host)
+        if structured_output:
+            llm = llm.bind(format=answer_schema(style))
+        backends.append(LLMBackend(host or "default", prompt | llm, llm_concurrency))
+    return LLMPool(backends, timeout=llm_timeout, max_queue=llm_max_queue)
+
+chain_component = LazyComponent("chain", create_chain)
+
+def get_chain():
+    return chain_component.get()
+
+prompt_version = hashlib.sha256(
+    f"{prompt_templates[prompt_style]}\0{prompt_token_budget}\0{prompt_description_chars}\0{structured_output}".encode("utf-8")
+).hexdigest()[:16]
+
+# Cache finished recommendations so repeated queries over the same documents skip the LLM
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("SHL_RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("SHL_RESPONSE_CACHE_TTL", "3600")) or None,
+)
+
+# Extracted job description text keyed by URL, revalidated with ETag/Last-Modified after its TTL
+url_ingestor = UrlIngestor()
+
+def cache_stats():
+    caches = {"responses": response_cache.stats(), "urls": url_ingestor.stats()}
+    # Scraping metrics must not load the embedding model
+    if embeddings_component.state == "ready":
+        caches["embeddings"] = get_embeddings().stats()
+    return caches
+
+def cache_lookups():
+    for name, stats in cache_stats().items():
+        yield (name, "hit"), stats["hits"] + stats.get("disk_hits", 0)
+        yield (name, "miss"), stats["misses"]
+
+Callback("shl_cache_lookups_total", "Cache lookups by cache and outcome.", "counter", ("cache", "result"), cache_lookups)
+Callback("shl_cache_hit_ratio", "Share of cache lookups answered from the cache.", "gauge", ("cache",),
+         lambda: (((name,), stats["hit_ratio"]) for name, stats in cache_stats().items()))
+def llm_pool_stats():
+    # Scraping metrics must not build the LLM pool
+    if chain_component.state == "ready" and isinstance(chain_component.value, LLMPool):
+        return chain_component.value.stats()
+    return None
+
+Callback("shl_llm_outstanding", "LLM calls in progress per backend.", "gauge", ("backend",),
+         lambda: (((backend["name"],), backend["outstanding"]) for backend in (llm_pool_stats() or {"backends": []})["backends"]))
+Callback("shl_llm_queue_depth", "LLM calls waiting for a free backend.", "gauge", (),
+         lambda: [((), stats["waiting"])] if (stats := llm_pool_stats()) else [])
+def llm_parse_failure_ratio():
+    with llm_answers_total.lock:
+        counts = dict(llm_answers_total.values)
+    total = sum(counts.values())
+    return [((), counts.get(("failed",), 0) / total)] if total else []
+
+Callback("shl_llm_parse_failure_ratio", "Share of LLM answers that could not be parsed.", "gauge", (), llm_parse_failure_ratio)
+Callback("shl_snapshot_info", "Snapshot version installed in this worker.", "gauge", ("version",),
+         lambda: [((snapshot_store.version,), 1)] if snapshot_store is not None and snapshot_store.version else [])
+Callback("shl_cache_entries", "Entries held in each in-memory cache.", "gauge", ("cache",),
+         lambda: (((name,), stats["size"]) for name, stats in cache_stats().items()))
+
+def recommendation_cache_key(query_text, assessments):
+    """Build the cache key from everything that determines the LLM answer"""
+    doc_ids = ",".join(str(doc.id) for doc in assessments)
+    payload = "\0".join([normalize_text(query_text), doc_ids, llm_model_name, prompt_version])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 def extract_text_from_url(url):
-    """Extract text content from a job description URL"""
+    """Extract text content from a job description URL; raises IngestError"""
+    return url_ingestor.fetch(url)
+
+async def aextract_text_from_url(url):
+    """Async variant of extract_text_from_url using the pooled HTTP client"""
+    client = http_client or httpx.AsyncClient(timeout=10, follow_redirects=True)
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-            text = soup.get_text()
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-            return text
-        else:
-            return f"Failed to retrieve content from URL: {response.status_code}"
-    except Exception as e:
-        return f"Error processing URL: {str(e)}"
+        # Parsing is CPU-bound, keep it off the event loop
+        return await url_ingestor.afetch(url, client, run_in_retrieval_pool)
+    finally:
+        if client is not http_client:
+            await client.aclose()
+
+def recommendation_from_metadata(metadata, explanation=None):
+    """Build one response record from catalog metadata"""
+    return {
+        "name": metadata.get("name", "Unknown Assessment"),
+        "url": metadata.get("url", "#"),
+        "remote_testing": metadata.get("remote_testing", "No"),
+        "adaptive_support": metadata.get("adaptive_support", "No"),
+        "duration": "Unknown" if pd.isna(metadata.get("duration")) else metadata["duration"],
+        "type": metadata.get("type", "Unknown"),
+        "explanation": explanation or f"This assessment matches your query for skills in {metadata.get('skills', 'various areas')}."
+    }
+
+def fallback_recommendations(assessments):
+    """Create fallback recommendations from vector results"""
+    fallback_recs = []
+    for doc in assessments[:10]:  # Limit to top 10
+        fallback_recs.append(recommendation_from_metadata(doc.metadata))
+    return {"recommendations": fallback_recs}
+
+def fast_recommendations(query_text, constraints=None, k=10):
+    """Answer from the catalog column filters reranked by vector score, without the LLM"""
+    if constraints is None:
+        constraints = parse_constraints(query_text)
+    catalog_index = get_catalog_index()
+    rows = catalog_index.filter(constraints)
+    scores = get_retriever().score_by_url(query_text)
+    urls = catalog_index.df["URL"]
+    # Stable sort, so without vector scores the catalog order is kept
+    rows.sort(key=lambda row: -scores.get(urls.iat[row], 0.0))
+    documents = [create_assessment_document(catalog_index.df.iloc[row], assessment_id(catalog_index.df.iloc[row])) for row in rows[:k]]
+    return fallback_recommendations(documents)
+
+def try_fast_path(query_text, mode):
+    """Return a fast-mode answer when the mode allows it, or None to use the LLM"""
+    if mode == "llm":
+        return None
+    constraints = parse_constraints(query_text)
+    if mode == "auto" and not is_structured_query(query_text, constraints, auto_max_words):
+        return None
+    with timed("fast_path"):
+        result = fast_recommendations(query_text, constraints)
+    # In auto mode an over-constrained query still goes to the LLM
+    if mode == "auto" and not result["recommendations"]:
+        return None
+    return result
+
+def retrieve(query_text):
+    return get_retriever().invoke(query_text)
+
+def retrieve_many(queries):
+    return get_retriever().invoke_many(queries)
+
+def build_assessment_context(assessments):
+    """Convert assessments to a string representation for the prompt"""
+    assessment_str = ""
+    for doc in assessments:
+        assessment_str += doc.page_content + "\n\n"
+    return assessment_str
+
+def parse_recommendations(result, style=None):
+    """Validate an LLM answer against the answer schema, keeping the valid items of a damaged one; None if unusable"""
+    answer, outcome, dropped = parse_answer(result, style or prompt_style)
+    if dropped:
+        llm_items_dropped_total.inc("invalid", amount=dropped)
+    if answer is None:
+        llm_answers_total.inc("failed")
+        fallback_total.inc(outcome)
+        return None
+    llm_answers_total.inc(outcome)
+    return answer
+
+def build_prompt_inputs(query_text, assessments, style=None):
+    """Return the chain inputs and the map from candidate id to document"""
+    if (style or prompt_style) == "full":
+        # Full answers name their assessments, which are matched back to the candidates by URL or name
+        id_map = {f"A{position + 1}": doc for position, doc in enumerate(assessments)}
+        return {"assessments": build_assessment_context(assessments), "query": query_text}, id_map
+    context, id_map = compact_candidates(assessments, prompt_token_budget, prompt_description_chars)
+    return {"assessments": context, "query": query_text}, id_map
+
+def hydrate_recommendations(recommendations, id_map):
+    """Replace LLM items with the catalog records of the candidates they name; None if no item names one"""
+    if recommendations is None or id_map is None:
+        return recommendations
+    items = recommendations.get("recommendations")
+    items = items if isinstance(items, list) else []
+    hydrated = rehydrate(items, id_map, recommendation_from_metadata)
+    if len(hydrated) < len(items):
+        llm_items_dropped_total.inc("unmatched", amount=len(items) - len(hydrated))
+    if not hydrated:
+        fallback_total.inc("unknown_candidates")
+        return None
+    return {"recommendations": hydrated}
+
+def llm_unavailable(error):
+    """Count an LLM call that missed its deadline or queue slot; None makes the caller fall back"""
+    print(f"LLM unavailable ({error.reason}): {error}")
+    fallback_total.inc(f"llm_{error.reason}")
+    return None
 
-def recommend_assessments(query_text):
+def generate_recommendations(query_text, assessments):
+    """Ask the LLM for recommendations, returning None if its answer is unusable"""
+    with timed("prompt"):
+        inputs, id_map = build_prompt_inputs(query_text, assessments)
+    try:
+        result = get_chain().invoke(inputs)
+    except LLMUnavailable as e:
+        return llm_unavailable(e)
+    with timed("parse"):
+        return hydrate_recommendations(parse_recommendations(result), id_map)
+
+async def agenerate_recommendations(query_text, assessments):
+    """Async variant of generate_recommendations; the LLM pool applies the queue limit and deadline"""
+    with timed("prompt"):
+        inputs, id_map = build_prompt_inputs(query_text, assessments)
+    try:
+        result = await get_chain().ainvoke(inputs)
+    except LLMUnavailable as e:
+        return llm_unavailable(e)
+    with timed("parse"):
+        return hydrate_recommendations(parse_recommendations(result), id_map)
+
+def recommend_assessments(query_text, mode="llm"):
     """Get assessment recommendations based on query text"""
     if not query_text.strip():
         return {"error": "Query text is empty"}
     
+    fast_result = try_fast_path(query_text, mode)
+    if fast_result is not None:
+        return fast_result
+    
     # Retrieve relevant assessments
-    assessments = retriever.invoke(query_text)
+    assessments = retrieve(query_text)
     
-    # Convert assessments to a string representation for the prompt
-    assessment_str = ""
-    for doc in assessments:
-        assessment_str += doc.page_content + "\n\n"
+    key = recommendation_cache_key(query_text, assessments)
+    recommendations = response_cache.get_or_compute(
+        key, lambda: generate_recommendations(query_text, assessments)
+    )
+    if recommendations is None:
+        # If JSON parsing fails, create a fallback response from the retrieved documents
+        return fallback_recommendations(assessments)
+    return recommendations
+
+async def arecommend_assessments(query_text, mode="llm", assessments=None):
+    """Async variant of recommend_assessments that never blocks the event loop"""
+    result, _ = await arecommend_with_outcome(query_text, mode, assessments)
+    return result
+
+async def arecommend_with_outcome(query_text, mode="llm", assessments=None, llm_slots=None):
+    """Return (result, fell_back); fell_back is True when the LLM answer was replaced by the retrieved candidates.
+
+    llm_slots, an asyncio.Semaphore, bounds how many of the callers sharing it wait on the LLM at once.
+    """
+    if not query_text.strip():
+        return {"error": "Query text is empty"}, False
     
-    # Generate recommendations with LLM
-    result = chain.invoke({"assessments": assessment_str, "query": query_text})
+    # Vector search embeds the query and scans the index, so run it in the retrieval pool
+    if mode != "llm":
+        fast_result = await run_in_retrieval_pool(try_fast_path, query_text, mode)
+        if fast_result is not None:
+            return fast_result, False
+    if assessments is None:
+        assessments = await run_in_retrieval_pool(retrieve, query_text)
     
-    # Process the result to ensure JSON format
+    key = recommendation_cache_key(query_text, assessments)
+    async with llm_slots or contextlib.nullcontext():
+        recommendations = await response_cache.aget_or_compute(
+            key, lambda: agenerate_recommendations(query_text, assessments)
+        )
+    if recommendations is None:
+        return fallback_recommendations(assessments), True
+    return recommendations, False
+
+def llm_capacity():
+    """LLM calls the pool runs at once, without queueing"""
+    chain = get_chain()
+    if isinstance(chain, LLMPool):
+        return sum(backend.max_concurrency for backend in chain.backends)
+    return len(llm_hosts or [None]) * llm_concurrency
+
+async def iter_batch_recommendations(queries, mode="llm", chunk_size=None):
+    """Yield (result, fell_back) for many queries in input order.
+
+    Each chunk is retrieved with a single batched embedding call and matrix
+    search, then its LLM calls run concurrently, never more than the LLM pool
+    runs at once, so a batch does not fill the pool's queue and turn its own
+    queries into llm_queue_full fallbacks. Closing the generator, as a client
+    disconnect does, cancels the queries of the current chunk.
+    """
+    chunk_size = chunk_size or batch_chunk_size
+    llm_slots = asyncio.Semaphore(llm_capacity()) if mode != "fast" else None
+    tasks = []
     try:
-        # Try to extract JSON content if surrounded by markdown code blocks
-        json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", result)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # If not in code blocks, try to find anything that looks like JSON
-            json_match = re.search(r"(\{[\s\S]*\})", result)
-            if json_match:
-                json_str = json_match.group(1)
-            else:
-                json_str = result
-        
-        # Clean up any non-JSON text before or after the JSON object
-        json_str = re.sub(r'^[^{]*', '', json_str)
-        json_str = re.sub(r'[^}]*$', '', json_str)
-        
-        # Parse JSON string to dict
-        recommendations = json.loads(json_str)
-        
-        # If LLM didn't return recommendations in the expected format, create a fallback
-        if "recommendations" not in recommendations:
-            # Create fallback recommendations from vector results
-            fallback_recs = []
-            for doc in assessments[:10]:  # Limit to top 10
-                metadata = doc.metadata
-                fallback_recs.append({
-                    "name": metadata.get("name", "Unknown Assessment"),
-                    "url": metadata.get("url", "#"),
-                    "remote_testing": metadata.get("remote_testing", "No"),
-                    "adaptive_support": metadata.get("adaptive_support", "No"),
-                    "duration": metadata.get("duration", "Unknown"),
-                    "type": metadata.get("type", "Unknown"),
-                    "explanation": f"This assessment matches your query for skills in {metadata.get('skills', 'various areas')}."
-                })
-            return {"recommendations": fallback_recs}
-        
-        return recommendations
-        
-    except Exception as e:
-        # If JSON parsing fails, create a fallback response from the retrieved documents
-        fallback_recs = []
-        for doc in assessments[:10]:  # Limit to top 10
-            metadata = doc.metadata
-            fallback_recs.append({
-                "name": metadata.get("name", "Unknown Assessment"),
-                "url": metadata.get("url", "#"),
-                "remote_testing": metadata.get("remote_testing", "No"),
-                "adaptive_support": metadata.get("adaptive_support", "No"),
-                "duration": metadata.get("duration", "Unknown"),
-                "type": metadata.get("type", "Unknown"),
-                "explanation": f"This assessment matches your query for skills in {metadata.get('skills', 'various areas')}."
-            })
-        return {"recommendations": fallback_recs}
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            retrieved = await run_in_retrieval_pool(retrieve_many, chunk)
+            tasks = [
+                asyncio.create_task(arecommend_with_outcome(query, mode, assessments, llm_slots))
+                for query, assessments in zip(chunk, retrieved)
+            ]
+            for task in tasks:
+                yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
 
 # API endpoints
-@app.get("/", response_class=HTMLResponse)
+@router.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Render the main page"""
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.get("/api/recommend")
-async def api_recommend(query: str = Query(None), url: str = Query(None)):
+@router.get("/api/recommend")
+async def api_recommend(query: str = Query(None), url: str = Query(None), mode: str = Query("llm")):
     """API endpoint for recommendations"""
+    if mode not in recommend_modes:
+        return JSONResponse(content={"error": f"mode must be one of {', '.join(recommend_modes)}"}, status_code=400)
     if url:
-        # Extract text from URL
-        text = extract_text_from_url(url)
-        return recommend_assessments(text)
+        # Extract text from URL; a failed fetch is reported, never sent to the LLM
+        try:
+            text = await aextract_text_from_url(url)
+        except IngestError as e:
+            return JSONResponse(content=e.to_dict(), status_code=e.status_code)
+        return await arecommend_assessments(text, mode)
     elif query:
         # Use the provided query directly
-        return recommend_assessments(query)
+        return await arecommend_assessments(query, mode)
+    else:
+        return JSONResponse(content={"error": "No query or URL provided"}, status_code=400)
+
+async def stream_recommendations(query_text, fmt="sse"):
+    """Yield provisional candidates, then each recommendation as the LLM closes it"""
+    if not query_text.strip():
+        yield format_event("error", {"error": "Query text is empty"}, fmt)
+        return
+    
+    assessments = await run_in_retrieval_pool(retrieve, query_text)
+    yield format_event("candidates", fallback_recommendations(assessments), fmt)
+    
+    key = recommendation_cache_key(query_text, assessments)
+    cached = response_cache.cache.get(key)
+    if cached is not None:
+        yield format_event("done", cached, fmt)
+        return
+    
+    style = prompt_style
+    with timed("prompt"):
+        inputs, id_map = build_prompt_inputs(query_text, assessments, style)
+    parser = RecommendationStreamParser()
+    streamed = []
+    chunks = []
+    try:
+        async for chunk in get_chain().astream(inputs):
+            chunks.append(chunk)
+            for item in parser.feed(chunk):
+                # Drops are counted once, when the complete answer is parsed
+                hydrated = rehydrate([validate_item(item, style)], id_map, recommendation_from_metadata)
+                if not hydrated:
+                    continue
+                item = hydrated[0]
+                streamed.append(item)
+                yield format_event("recommendation", {"index": len(streamed) - 1, "recommendation": item}, fmt)
+    except LLMUnavailable as e:
+        # Finish with whatever was streamed, or the vector-ranked candidates
+        llm_unavailable(e)
+        chunks = None
+    
+    recommendations = None
+    if chunks is not None:
+        with timed("parse"):
+            recommendations = hydrate_recommendations(parse_recommendations("".join(chunks), style), id_map)
+    if recommendations is not None:
+        response_cache.cache.set(key, recommendations)
+    elif streamed:
+        # The full answer did not parse, but every streamed object did
+        recommendations = {"recommendations": streamed}
+    else:
+        recommendations = fallback_recommendations(assessments)
+    yield format_event("done", recommendations, fmt)
+
+@router.get("/api/recommend/stream")
+async def api_recommend_stream(query: str = Query(None), url: str = Query(None), format: str = Query("sse")):
+    """Streaming API endpoint for recommendations (server-sent events or NDJSON)"""
+    if format not in ("sse", "ndjson"):
+        return JSONResponse(content={"error": "format must be 'sse' or 'ndjson'"}, status_code=400)
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    if url:
+        try:
+            text = await aextract_text_from_url(url)
+        except IngestError as e:
+            # EventSource cannot read error bodies, so report it as a stream event
+            return StreamingResponse(iter([format_event("error", e.to_dict(), format)]), media_type=media_type)
+    elif query:
+        text = query
     else:
         return JSONResponse(content={"error": "No query or URL provided"}, status_code=400)
+    return StreamingResponse(
+        stream_recommendations(text, format),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/api/recommend/batch")
+async def api_recommend_batch(queries: List[str] = Body(..., embed=True), mode: str = Body("llm", embed=True)):
+    """Batch API endpoint, streaming one NDJSON line per query in input order"""
+    if mode not in recommend_modes:
+        return JSONResponse(content={"error": f"mode must be one of {', '.join(recommend_modes)}"}, status_code=400)
+    if len(queries) > batch_max_queries:
+        return JSONResponse(content={"error": f"At most {batch_max_queries} queries per batch"}, status_code=413)
+    
+    async def lines():
+        started = time.perf_counter()
+        index = 0
+        fallbacks = 0
+        async for result, fell_back in iter_batch_recommendations(queries, mode):
+            yield json.dumps({"index": index, **result}) + "\n"
+            index += 1
+            fallbacks += fell_back
+        elapsed = time.perf_counter() - started
+        yield json.dumps({"summary": {
+            "count": index,
+            "fallbacks": fallbacks,
+            "seconds": round(elapsed, 3),
+            "queries_per_second": round(index / elapsed, 2) if elapsed else None,
+        }}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Catalog listing, composed from pre-serialized rows and cached per ETag with its gzipped form
+assessment_responses = LRUCache(max_entries=64)
+gzip_min_bytes = 1024
+
+def etag_matches(if_none_match, etags):
+    """Weak comparison, as If-None-Match requires"""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or any(etag in candidates for etag in etags)
+
+@router.get("/api/assessments")
+async def get_all_assessments(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    remote: Optional[bool] = Query(None),
+    adaptive: Optional[bool] = Query(None),
+    max_duration: Optional[float] = Query(None, ge=0),
+):
+    """Return catalog assessments, optionally filtered, paginated and projected to some fields"""
+    payload = get_catalog_payload()
+    try:
+        columns = payload.resolve_fields(fields.split(",")) if fields else None
+    except KeyError as e:
+        return JSONResponse(content={"error": f"Unknown field {e.args[0]}, available: {', '.join(payload.columns)}"}, status_code=400)
+    
+    # The representation depends only on the catalog content and the parameters
+    parameters = json.dumps([offset, limit, columns, (type or "").upper(), remote, adaptive, max_duration])
+    etag = '"' + hashlib.sha256(f"{payload.version}\0{parameters}".encode("utf-8")).hexdigest()[:32] + '"'
+    gzip_etag = etag[:-1] + '-gzip"'
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    accepts_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    if etag_matches(request.headers.get("if-none-match"), (etag, gzip_etag)):
+        return Response(status_code=304, headers={**headers, "ETag": gzip_etag if accepts_gzip else etag})
+    
+    entry = assessment_responses.get(etag)
+    if entry is None:
+        # The payload's own index: during a snapshot swap the shared one may belong to another catalog
+        catalog_index = payload.index
+        bits = catalog_index.filter_bits({
+            "types": (type or "").upper(),
+            "remote_testing": remote is True,
+            "adaptive_support": adaptive is True,
+            "max_duration": max_duration,
+        })
+        if remote is False:
+            bits &= ~catalog_index.remote_bits
+        if adaptive is False:
+            bits &= ~catalog_index.adaptive_bits
+        positions = catalog_index.rows(bits)
+        page = positions[offset:offset + limit] if limit else positions[offset:]
+        entry = {"body": payload.body(page, columns, total=len(positions), offset=offset, limit=limit), "gzip": None}
+        assessment_responses.set(etag, entry)
+    
+    body = entry["body"]
+    if accepts_gzip and len(body) >= gzip_min_bytes:
+        if entry["gzip"] is None:
+            entry["gzip"] = gzip.compress(body, compresslevel=6)
+        return Response(content=entry["gzip"], media_type="application/json",
+                        headers={**headers, "ETag": gzip_etag, "Content-Encoding": "gzip"})
+    return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag})
+
+# Liveness and readiness probes
+@router.get("/healthz")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "alive", "uptime_seconds": round(time.time() - started_at, 3)}
 
-# Direct database access endpoint for testing
-@app.get("/api/assessments")
-async def get_all_assessments():
-    """Return all assessments in the database for testing"""
-    assessments_list = assessments_df.to_dict(orient="records")
-    return {"assessments": assessments_list}
+@router.get("/readyz")
+async def readiness_check():
+    """Report warm-up state of every lazily initialized component"""
+    ready, components = readiness()
+    return JSONResponse(
+        content={"status": "ready" if ready else "warming", "components": components},
+        status_code=200 if ready else 503,
+    )
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Stage latency histograms, fallback counters and cache hit ratios in Prometheus text format"""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+# Admin endpoints are disabled unless a token is configured, and then require it as a bearer token
+admin_token = os.environ.get("SHL_ADMIN_TOKEN", "")
+
+def admin_error(request):
+    """A response refusing the admin request, or None if it carries the admin token"""
+    if not admin_token:
+        return JSONResponse(content={"error": "Admin endpoints are disabled, set SHL_ADMIN_TOKEN to enable them"}, status_code=404)
+    supplied = request.headers.get("authorization", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {admin_token}".encode("utf-8")):
+        return JSONResponse(content={"error": "Missing or invalid admin token"}, status_code=401,
+                            headers={"WWW-Authenticate": "Bearer"})
+    return None
+
+# Admin endpoints for the recommendation and embedding caches
+@router.get("/api/admin/cache")
+async def get_cache_stats(request: Request):
+    """Return cache statistics"""
+    if (denied := admin_error(request)) is not None:
+        return denied
+    return {
+        "responses": response_cache.stats(),
+        "embeddings": get_embeddings().stats(),
+        "urls": url_ingestor.stats(),
+        "prompt_version": prompt_version,
+        "prompt_style": prompt_style,
+        "model": llm_model_name,
+    }
+
+@router.get("/api/admin/llm")
+async def get_llm_stats(request: Request):
+    """Return per-backend load and health of the LLM pool"""
+    if (denied := admin_error(request)) is not None:
+        return denied
+    stats = llm_pool_stats()
+    if stats is None:
+        return JSONResponse(content={"error": "The LLM pool has not been created yet"}, status_code=503)
+    return stats
+
+@router.get("/api/admin/snapshot")
+async def get_snapshot_status(request: Request):
+    """Return the snapshot version installed in the worker that answers"""
+    if (denied := admin_error(request)) is not None:
+        return denied
+    if snapshot_store is None:
+        return JSONResponse(content={"error": "Snapshots are not enabled (SHL_SNAPSHOT_DIR)"}, status_code=404)
+    return {**snapshot_store.status(), "pid": os.getpid()}
+
+@router.delete("/api/admin/cache")
+async def flush_cache(request: Request, include_embeddings: bool = Query(False)):
+    """Flush the recommendation and URL caches, and optionally the embedding cache"""
+    if (denied := admin_error(request)) is not None:
+        return denied
+    flushed = {"responses": len(response_cache.cache), "urls": len(url_ingestor.cache)}
+    response_cache.clear()
+    url_ingestor.clear()
+    if include_embeddings:
+        embeddings = get_embeddings()
+        flushed["embeddings"] = len(embeddings.memory)
+        embeddings.clear()
+    return {"flushed": flushed}
+
+def create_app():
+    """Application factory; components are initialized lazily or by the startup warm-up"""
+    app = FastAPI(title="SHL Assessment Recommendation System", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    app.add_middleware(
+        TimingMiddleware,
+        paths={route.path for route in router.routes},
+        server_timing=server_timing_enabled,
+    )
+    return app
+
+app = create_app()
 
 # CLI interface
-def cli_interface():
+def cli_interface(mode="llm"):
     while True:
         print("\n\n-------------------------------")
         print("SHL Assessment Recommendation System")
@@ -208,7 +791,7 @@ def cli_interface():
         elif choice == "1":
             query = input("Enter your query: ")
             print("\nProcessing...\n")
-            result = recommend_assessments(query)
+            result = recommend_assessments(query, mode)
             
             # Pretty print recommendations
             if "recommendations" in result and result["recommendations"]:
@@ -227,9 +810,13 @@ def cli_interface():
         elif choice == "2":
             url = input("Enter job description URL: ")
             print("\nExtracting text from URL...\n")
-            text = extract_text_from_url(url)
+            try:
+                text = extract_text_from_url(url)
+            except IngestError as e:
+                print(f"Could not use this URL: {e}")
+                continue
             print("\nProcessing...\n")
-            result = recommend_assessments(text)
+            result = recommend_assessments(text, mode)
             
             # Pretty print recommendations
             if "recommendations" in result and result["recommendations"]:
@@ -248,9 +835,85 @@ def cli_interface():
         else:
             print("Invalid choice. Please try again.")
 
+# Offline bulk scoring
+def read_batch_input(path):
+    """Read queries from JSONL, one {"query": ..., "id": ...} object or JSON string per line"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            records.append(record)
+    return records
+
+def count_completed_lines(path):
+    """Number of complete result lines already written, used to resume a run"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        data = f.read()
+        # Drop a partially written trailing line so appending starts cleanly
+        end = data.rfind(b"\n") + 1
+        f.truncate(end)
+    return data[:end].count(b"\n")
+
+async def run_batch(input_path, output_path, mode="llm", chunk_size=None):
+    """Score a JSONL file of queries, appending results and resuming after the last written line"""
+    records = read_batch_input(input_path)
+    done = count_completed_lines(output_path)
+    if done:
+        print(f"Resuming after {done} completed queries")
+    pending = records[done:]
+    queries = [record.get("query") or "" for record in pending]
+    
+    started = time.perf_counter()
+    processed = 0
+    fallbacks = 0
+    with open(output_path, "a", encoding="utf-8") as out:
+        async for result, fell_back in iter_batch_recommendations(queries, mode, chunk_size):
+            record = pending[processed]
+            out.write(json.dumps({"index": done + processed, "id": record.get("id"), "query": record.get("query"), **result}) + "\n")
+            # Each flushed line is a checkpoint
+            out.flush()
+            processed += 1
+            fallbacks += fell_back
+            if processed % 10 == 0 or processed == len(pending):
+                elapsed = time.perf_counter() - started
+                print(f"Processed {done + processed}/{len(records)} queries ({processed / elapsed:.2f} queries/s, {fallbacks} fallbacks)")
+    
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"Finished {processed} queries in {elapsed:.1f}s ({rate:.2f} queries/s, {fallbacks} fell back to retrieval order)")
+    return {"count": processed, "fallbacks": fallbacks, "seconds": elapsed, "queries_per_second": rate}
+
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1 and sys.argv[1] == "cli":
-        cli_interface()
+    parser = argparse.ArgumentParser(description="SHL Assessment Recommendation System")
+    parser.add_argument("command", nargs="?", default="serve", choices=["serve", "cli", "batch"])
+    parser.add_argument("input", nargs="?", help="batch: JSONL file of queries")
+    parser.add_argument("output", nargs="?", help="batch: JSONL file to append results to")
+    parser.add_argument("--mode", default="llm", choices=recommend_modes, help="recommendation mode for the CLI and batch")
+    parser.add_argument("--chunk-size", type=int, default=None, help="batch: queries retrieved per embedding call")
+    parser.add_argument("--workers", type=int, default=os.environ.get("SHL_WORKERS"), help="serve: worker processes sharing one snapshot, without auto-reload")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    if args.command == "cli":
+        cli_interface(args.mode)
+    elif args.command == "batch":
+        if not args.input or not args.output:
+            parser.error("batch requires input and output paths")
+        asyncio.run(run_batch(args.input, args.output, args.mode, args.chunk_size))
+    elif args.workers is not None:
+        # Workers share one snapshot instead of each reading the CSV and opening Chroma
+        os.environ.setdefault("SHL_SNAPSHOT_DIR", "snapshots")
+        if os.environ["SHL_SNAPSHOT_DIR"]:
+            store = SnapshotStore(os.environ["SHL_SNAPSHOT_DIR"])
+            if store.current_version() is None:
+                store.publish()
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
     else:
-        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
@@ -0,0 +1,191 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from in-memory search up to slow LLM generations
+default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+# Monotonic count per label combination
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry[name] = self
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield self.name, self.labelnames, labels, value
+
+
+# Cumulative bucket counts, sum and count per label combination
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=default_buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+        registry[name] = self
+
+    def observe(self, value, *labels):
+        # Bucket bounds are inclusive, so a value equal to a bound lands in that bucket
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self.series.items()]
+        bucket_names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", bucket_names, labels + (format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, total
+            yield f"{self.name}_count", self.labelnames, labels, count
+
+
+# Values read at scrape time, so the hot path pays nothing for them
+class Callback:
+    def __init__(self, name, help, kind, labelnames, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        registry[name] = self
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, self.labelnames, tuple(labels), value
+
+
+registry = {}
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(registry.values()):
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labelnames, labels)} {format_value(value)}")
+        except Exception as e:
+            print(f"Error collecting metric {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = Histogram("shl_stage_seconds", "Time spent in each recommendation stage.", ("stage",))
+request_seconds = Histogram("shl_request_seconds", "HTTP request latency by route.", ("path",))
+fallback_total = Counter("shl_fallback_total", "Answers that took a fallback path, by reason.", ("reason",))
+llm_answers_total = Counter("shl_llm_answers_total", "LLM answers by parse outcome.", ("outcome",))
+llm_items_dropped_total = Counter("shl_llm_items_dropped_total", "Items dropped from LLM answers, by reason.", ("reason",))
+
+# Stage durations of the current request, only collected when Server-Timing is enabled
+request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def record(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+    spans = request_spans.get()
+    if spans is not None:
+        spans[stage] = spans.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def server_timing_header(spans, total):
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# ASGI middleware recording request latency per route and, optionally, a Server-Timing header
+class TimingMiddleware:
+    def __init__(self, app, paths=(), server_timing=False):
+        self.app = app
+        # Unknown paths share one label so scanners cannot blow up the series count
+        self.paths = set(paths)
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        if not self.server_timing:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.observe(scope, started)
+            return
+
+        spans = {}
+        token = request_spans.set(spans)
+
+        async def send_with_timing(message):
+            # Streaming responses send headers first, so only stages finished by then are listed
+            if message["type"] == "http.response.start":
+                header = server_timing_header(spans, time.perf_counter() - started)
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_spans.reset(token)
+            self.observe(scope, started)
+
+    def observe(self, scope, started):
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        request_seconds.observe(time.perf_counter() - started, path)
@@ -0,0 +1,125 @@
+"""Fuzz the LLM answer parser with malformed completions.
+
+Checks every completion in the corpus against its expected outcome and the
+items that must survive, then derives damaged variants of the well-formed
+ones (truncation, deleted or inserted characters, wrapping prose) and reports
+how many of them each parser can still use, next to the regex extraction the
+structured parser replaced. Exits 1 when a corpus expectation is not met.
+
+    python parse_fuzz.py
+    python parse_fuzz.py --mutations 2000 --seed 7 --json fuzz.json
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+
+from structured import parse_answer
+
+
+def legacy_parse(text):
+    """The regex salvage chain used before structured parsing, for comparison"""
+    try:
+        match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
+        if match:
+            json_str = match.group(1)
+        else:
+            match = re.search(r"(\{[\s\S]*\})", text)
+            json_str = match.group(1) if match else text
+        json_str = re.sub(r"^[^{]*", "", json_str)
+        json_str = re.sub(r"[^}]*$", "", json_str)
+        answer = json.loads(json_str)
+    except Exception:
+        return None
+    return answer if isinstance(answer, dict) and "recommendations" in answer else None
+
+
+def item_keys(answer, style):
+    field = "id" if style == "compact" else "name"
+    return [item.get(field) for item in answer["recommendations"]] if answer else []
+
+
+def mutate(text, rng):
+    """One randomly damaged copy of a completion"""
+    kind = rng.choice(["truncate", "delete", "insert", "prose", "fence"])
+    if kind == "truncate":
+        return kind, text[:rng.randrange(1, len(text))]
+    if kind == "delete":
+        position = rng.randrange(len(text))
+        return kind, text[:position] + text[position + 1:]
+    if kind == "insert":
+        position = rng.randrange(len(text))
+        return kind, text[:position] + rng.choice(['"', ",", "}", "]", "{", "\n", "\\"]) + text[position:]
+    if kind == "prose":
+        return kind, "Sure! Based on the query {role}, here you go:\n" + text + "\nHope this helps."
+    return kind, "```json\n" + text + "\n``` and a second block ```{}```"
+
+
+def check_corpus(cases):
+    failures = []
+    for case in cases:
+        answer, outcome, _ = parse_answer(case["completion"], case["style"])
+        keys = item_keys(answer, case["style"])
+        if outcome != case["expect"] or keys != case["ids"]:
+            failures.append({"note": case["note"], "expected": [case["expect"], case["ids"]], "got": [outcome, keys]})
+    return failures
+
+
+def fuzz(cases, count, rng):
+    seeds = [case for case in cases if case["expect"] == "valid"]
+    outcomes = {}
+    usable = {"structured": 0, "legacy": 0}
+    by_kind = {}
+    items_kept = 0
+    items_total = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        case = rng.choice(seeds)
+        kind, text = mutate(case["completion"], rng)
+        answer, outcome, _ = parse_answer(text, case["style"])
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        stats = by_kind.setdefault(kind, {"count": 0, "structured": 0, "legacy": 0})
+        stats["count"] += 1
+        if answer is not None:
+            usable["structured"] += 1
+            stats["structured"] += 1
+        if legacy_parse(text) is not None:
+            usable["legacy"] += 1
+            stats["legacy"] += 1
+        items_total += len(case["ids"])
+        items_kept += len(item_keys(answer, case["style"]))
+    elapsed = time.perf_counter() - started
+    return {
+        "mutations": count,
+        "outcomes": outcomes,
+        "parse_failure_rate": {name: 1 - value / count for name, value in usable.items()},
+        "items_recovered": items_kept / items_total if items_total else 0.0,
+        "by_kind": by_kind,
+        "us_per_completion": elapsed / count * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default="parse_fuzz_corpus.jsonl", help="JSONL completions with expected outcomes")
+    parser.add_argument("--mutations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    failures = check_corpus(cases)
+    results = {"corpus": len(cases), "corpus_failures": failures, "fuzz": fuzz(cases, args.mutations, random.Random(args.seed))}
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
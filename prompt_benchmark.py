@@ -0,0 +1,90 @@
+"""Compare prompt size and end-to-end latency of the full and compact prompt styles.
+
+Runs a fixed query set through retrieval and prompt building for each style and
+reports prompt tokens; with --generate it also calls the LLM and reports
+end-to-end latency and how many answers produced usable recommendations.
+
+    python prompt_benchmark.py
+    python prompt_benchmark.py --generate --json prompt_benchmark.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from prompting import estimate_tokens
+
+queries = [
+    "I am hiring for Java developers who can also collaborate effectively with my business teams. Looking for an assessment(s) that can be completed in 40 minutes.",
+    "Looking to hire mid-level professionals who are proficient in Python, SQL and JavaScript. Need an assessment package that can test all skills with max duration of 60 minutes.",
+    "I need to assess candidates for analytical thinking and personality traits for an analyst position. Time limit is less than 30 minutes.",
+    "Entry-level customer service representatives for a bank call center",
+    "Senior sales manager with strong leadership and negotiation skills",
+    "Remote administrative assistant, adaptive test preferred",
+]
+
+
+def measure_style(main, style, retrieved, generate):
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_template(main.prompt_templates[style])
+    chain = main.create_chain(style) if generate else None
+    rows = []
+    for query, assessments in zip(queries, retrieved):
+        inputs, id_map = main.build_prompt_inputs(query, assessments, style)
+        prompt_text = prompt.format(**inputs)
+        row = {"query": query, "prompt_chars": len(prompt_text), "prompt_tokens": estimate_tokens(prompt_text)}
+        if generate:
+            started = time.perf_counter()
+            result = chain.invoke(inputs)
+            row["latency"] = time.perf_counter() - started
+            recommendations = main.hydrate_recommendations(main.parse_recommendations(result, style), id_map)
+            row["usable"] = recommendations is not None
+            row["completion_tokens"] = estimate_tokens(result)
+        rows.append(row)
+    return rows
+
+
+def summarize(rows):
+    summary = {"prompt_tokens_mean": float(np.mean([row["prompt_tokens"] for row in rows]))}
+    if "latency" in rows[0]:
+        latencies = [row["latency"] for row in rows]
+        summary["latency_p50"] = float(np.percentile(latencies, 50))
+        summary["latency_p95"] = float(np.percentile(latencies, 95))
+        summary["completion_tokens_mean"] = float(np.mean([row["completion_tokens"] for row in rows]))
+        summary["usable_rate"] = sum(row["usable"] for row in rows) / len(rows)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generate", action="store_true", help="also call the LLM and time each answer")
+    parser.add_argument("--json", help="write per-query results and summaries to this file")
+    args = parser.parse_args()
+
+    import main as app
+
+    # Both styles see the same retrieved candidates
+    retrieved = [app.retrieve(query) for query in queries]
+    results = {}
+    for style in ("full", "compact"):
+        rows = measure_style(app, style, retrieved, args.generate)
+        results[style] = {"summary": summarize(rows), "queries": rows}
+
+    for style, result in results.items():
+        summary = result["summary"]
+        line = f"{style:>8}: {summary['prompt_tokens_mean']:.0f} prompt tokens"
+        if "latency_p50" in summary:
+            line += f", p50 {summary['latency_p50']:.2f}s, p95 {summary['latency_p95']:.2f}s, usable {summary['usable_rate']:.0%}"
+        print(line)
+    reduction = 1 - results["compact"]["summary"]["prompt_tokens_mean"] / results["full"]["summary"]["prompt_tokens_mean"]
+    print(f"Prompt tokens reduced by {reduction:.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import re
+
+import pandas as pd
+
+# Type letters are explained once in a legend instead of a Skills field per candidate
+from filters import type_skill_map as type_names
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting; llama-family tokenizers average about 4 characters per token"""
+    return (len(text) + 3) // 4
+
+
+def truncate(text, limit):
+    text = re.sub(r"\s+", " ", str(text)).strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip(",.;:") + "..."
+
+
+def candidate_line(candidate_id, metadata, description_chars):
+    fields = [
+        candidate_id,
+        str(metadata.get("name", "")),
+        f"type={metadata.get('type', '')}",
+        f"remote={metadata.get('remote_testing', 'No')}",
+        f"adaptive={metadata.get('adaptive_support', 'No')}",
+    ]
+    duration = metadata.get("duration")
+    if duration is not None and not pd.isna(duration) and str(duration).strip():
+        fields.append(f"minutes={duration}")
+    if description_chars > 0 and metadata.get("description"):
+        fields.append(truncate(metadata["description"], description_chars))
+    return " | ".join(fields)
+
+
+def compact_candidates(assessments, token_budget=1200, description_chars=200):
+    """Serialize candidates as short-id lines within a token budget.
+
+    Returns the prompt text and a map from short id to Document. Candidates are
+    kept in retrieval order; when one does not fit with its description it is
+    added without one, and serialization stops once even that does not fit.
+    """
+    letters = sorted({letter for doc in assessments for letter in str(doc.metadata.get("type", "")) if letter in type_names})
+    header = "Types: " + ", ".join(f"{letter}={type_names[letter]}" for letter in letters)
+    lines = [header]
+    used = estimate_tokens(header)
+    id_map = {}
+
+    for doc in assessments:
+        candidate_id = f"A{len(id_map) + 1}"
+        line = candidate_line(candidate_id, doc.metadata, description_chars)
+        if used + estimate_tokens(line) > token_budget:
+            line = candidate_line(candidate_id, doc.metadata, 0)
+            if used + estimate_tokens(line) > token_budget:
+                break
+        lines.append(line)
+        used += estimate_tokens(line) + 1
+        id_map[candidate_id] = doc
+    return "\n".join(lines), id_map
+
+
+def match_key(text):
+    return " ".join(str(text or "").lower().split())
+
+
+def rehydrate(items, id_map, build):
+    """Map LLM items that reference candidates back to full catalog records.
+
+    Items are matched by short id, else by URL or name, ignoring case and
+    spacing; unknown and repeated candidates are dropped. `build(metadata,
+    explanation)` creates the response record.
+    """
+    by_name = {match_key(doc.metadata.get("name")): doc for doc in id_map.values()}
+    by_url = {match_key(doc.metadata.get("url")).rstrip("/"): doc for doc in id_map.values() if doc.metadata.get("url")}
+    results = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        doc = id_map.get(str(item.get("id", "")).strip().upper())
+        if doc is None and item.get("url"):
+            doc = by_url.get(match_key(item["url"]).rstrip("/"))
+        if doc is None:
+            doc = by_name.get(match_key(item.get("name")))
+        if doc is None or id(doc) in seen:
+            continue
+        seen.add(id(doc))
+        results.append(build(doc.metadata, item.get("explanation")))
+    return results
@@ -0,0 +1,172 @@
+"""Check the catalog crawler against a local fixture HTTP server.
+
+Serves the pages in fixtures/scrape, where each catalog page only links to its
+neighbours and one product page is sent without validators, then runs
+scrape_shl.scrape three times with the same cache directory:
+
+1. a cold crawl must discover every catalog page, keep the catalog order and
+   parse every product page;
+2. a second crawl must be answered with 304s (or identical bodies) only and
+   parse nothing;
+3. after one product page changes, only that page is downloaded and parsed.
+
+Exits 1 when any expectation is not met.
+
+    python scrape_check.py
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import scrape_shl
+from fixture_server import FixtureServer
+
+# Product pages served without ETag, so the crawler has to compare bodies
+no_validators = {"customer-service-simulation"}
+expected_names = [
+    "Java 8 (New)",
+    "Verify - Numerical Ability",
+    "Occupational Personality Questionnaire OPQ32r",
+    "Sales Manager Solution",
+    "Customer Service Simulation",
+    "SQL Server (New)",
+]
+
+
+def fixture_page(directory, overrides, path, query):
+    """(body, send an ETag) for a request path, None if there is no such page"""
+    parts = [part for part in path.split("/") if part]
+    if parts == ["catalog"]:
+        name = f"catalog-{query.get('start', ['0'])[0]}.html"
+        slug = None
+    elif len(parts) == 2 and parts[0] == "view":
+        slug = parts[1]
+        name = os.path.join("products", f"{slug}.html")
+    else:
+        return None
+    if name in overrides:
+        return overrides[name], slug not in no_validators
+    try:
+        with open(os.path.join(directory, name), "rb") as f:
+            return f.read(), slug not in no_validators
+    except OSError:
+        return None
+
+
+def fixture_handler(directory, overrides):
+    """Handler serving the fixture pages, or their replacements in overrides, with ETags"""
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            page = fixture_page(directory, overrides, url.path, parse_qs(url.query))
+            if page is None:
+                self.send_error(404)
+                return
+            body, with_etag = page
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if with_etag and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if with_etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FixtureHandler
+
+
+def run_scrape(first_url, output, cache_dir):
+    """Scrape once and return (CSV rows, descriptions of the product pages parsed during the run)"""
+    parsed = []
+    original = scrape_shl.parse_product_page
+
+    def counting_parse(content):
+        result = original(content)
+        parsed.append(result["description"])
+        return result
+
+    scrape_shl.parse_product_page = counting_parse
+    try:
+        scrape_shl.scrape(first_url, output, cache_dir, concurrency=4, rate=1000.0, burst=100)
+    finally:
+        scrape_shl.parse_product_page = original
+    with open(output, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f)), parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=os.path.join("fixtures", "scrape"), help="directory with the fixture pages")
+    args = parser.parse_args()
+
+    overrides = {}
+    server = FixtureServer(fixture_handler(args.fixtures, overrides)).start()
+    workdir = tempfile.mkdtemp(prefix="scrape-check-")
+    output = os.path.join(workdir, "assessments.csv")
+    cache_dir = os.path.join(workdir, "cache")
+    # Like the real start URL, the first link repeats the type parameter
+    first_url = f"{server.base_url}/catalog/?start=0&type=2&type=2"
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    try:
+        rows, parsed = run_scrape(first_url, output, cache_dir)
+        expect([row["Name"] for row in rows] == expected_names, "cold crawl: catalog pages missing or out of order")
+        expect(server.statuses("/catalog/") == {200: 3}, f"cold crawl: catalog requests {server.statuses('/catalog/')}")
+        expect(len(parsed) == len(expected_names), f"cold crawl: parsed {len(parsed)} product pages")
+        by_name = {row["Name"]: row for row in rows}
+        java = by_name.get("Java 8 (New)", {})
+        expect(
+            (java.get("Type"), java.get("RemoteTesting"), java.get("AdaptiveSupport"), java.get("Duration")) == ("K", "Yes", "Yes", "18"),
+            f"cold crawl: unexpected Java 8 row {java}",
+        )
+        expect(by_name.get("Sales Manager Solution", {}).get("Skills") == "Ability & Aptitude, Biodata and Situational Judgement, Personality and Behaviour", "cold crawl: skills not mapped")
+        cold = server.statuses("/")
+
+        server.reset_counts()
+        rows, parsed = run_scrape(first_url, output, cache_dir)
+        warm = server.statuses("/")
+        expect(warm.get(200, 0) == len(no_validators), f"warm crawl: {warm.get(200, 0)} full responses")
+        expect(warm.get(304, 0) == 3 + len(expected_names) - len(no_validators), f"warm crawl: {warm.get(304, 0)} revalidations")
+        expect(parsed == [], f"warm crawl: re-parsed {len(parsed)} product pages")
+        expect([row["Name"] for row in rows] == expected_names, "warm crawl: rows differ from the cold crawl")
+        expect(by_name["Java 8 (New)"]["Description"] == next(row["Description"] for row in rows if row["Name"] == "Java 8 (New)"), "warm crawl: cached description lost")
+
+        changed_page = os.path.join("products", "java-8-new.html")
+        with open(os.path.join(args.fixtures, changed_page), "rb") as f:
+            overrides[changed_page] = f.read().replace(b"minutes = 18", b"minutes = 25")
+        server.reset_counts()
+        rows, parsed = run_scrape(first_url, output, cache_dir)
+        changed = server.statuses("/view/java-8-new/")
+        expect(changed == {200: 1}, f"changed page: {changed}")
+        expect(len(parsed) == 1, f"changed page: parsed {len(parsed)} product pages")
+        java = next((row for row in rows if row["Name"] == "Java 8 (New)"), {})
+        expect(java.get("Duration") == "25", f"changed page: duration {java.get('Duration')}")
+        summary = {"cold": cold, "warm": warm, "after_change": server.statuses("/"), "failures": failures}
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(summary, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,143 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, parse_qs
+import argparse
 import csv
+import hashlib
+import json
+import os
 import re
+import threading
 import time
 
-type_skill_map = {
-    'A': 'Ability & Aptitude',
-    'B': 'Biodata and Situational Judgement',
-    'C': 'Competencies',
-    'D': 'Development & 360',
-    'E': 'Assessment Exercises',
-    'K': 'Knowledge and Skills',
-    'P': 'Personality and Behaviour',
-    'S': 'Simulations',
-}
-
-urls = [
-    'https://www.shl.com/solutions/products/product-catalog/?start=0&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=12&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=24&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=36&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=48&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=60&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=72&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=84&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=96&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=108&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=120&type=2&type=2',
-    'https://www.shl.com/solutions/products/product-catalog/?start=132&type=2&type=2',
-]
-
-data = []
-
-for url in urls:
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+from filters import type_skill_map
 
+start_url = 'https://www.shl.com/solutions/products/product-catalog/?start=0&type=2&type=2'
+csv_file = "shl_assessments_with_skills.csv"
+csv_header = ["Name", "URL", "RemoteTesting", "AdaptiveSupport", "Type", "Skills", "Description", "Duration"]
+
+
+# Token bucket shared by all worker threads: `rate` requests per second with bursts of `burst`
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# On-disk response cache holding validators, bodies and the fields parsed from each page
+class ResponseCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def body_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def get(self, url):
+        with self.lock:
+            return self.entries.get(url)
+
+    def read_body(self, url):
+        with open(self.body_path(url), "rb") as f:
+            return f.read()
+
+    def store(self, url, response):
+        with open(self.body_path(url), "wb") as f:
+            f.write(response.content)
+        with self.lock:
+            self.entries[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_hash": hashlib.sha256(response.content).hexdigest(),
+            }
+
+    def set_parsed(self, url, parsed):
+        with self.lock:
+            if url in self.entries:
+                self.entries[url]["parsed"] = parsed
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+
+
+# Pooled, rate-limited HTTP client that revalidates cached pages with ETag/Last-Modified
+class Fetcher:
+    def __init__(self, cache, concurrency=8, rate=4.0, burst=4, timeout=20):
+        self.cache = cache
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"fetched": 0, "not_modified": 0, "unchanged": 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def fetch(self, url):
+        """Return (body, changed); changed is False when the cached copy is still current"""
+        entry = self.cache.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        self.bucket.acquire()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry:
+            self.count("not_modified")
+            return self.cache.read_body(url), False
+        response.raise_for_status()
+
+        # Servers without validators still return identical bodies for unchanged pages
+        unchanged = entry is not None and entry.get("content_hash") == hashlib.sha256(response.content).hexdigest()
+        self.cache.store(url, response)
+        if unchanged:
+            self.count("unchanged")
+            self.cache.set_parsed(url, entry.get("parsed"))
+            return response.content, False
+        self.count("fetched")
+        return response.content, True
+
+
+def parse_catalog_rows(content, page_url):
+    """Extract the assessment rows from one catalog listing page"""
+    soup = BeautifulSoup(content, 'html.parser')
     rows = soup.find_all('tr', attrs={'data-course-id': True})
+    data = []
 
     for row in rows:
         title_cell = row.find('td', class_='custom__table-heading__title')
@@ -44,7 +145,7 @@ for url in urls:
         title = a_tag.get_text(strip=True) if a_tag else "N/A"
         link = a_tag['href'] if a_tag else "#"
         if not link.startswith("http"):
-            link = "https://www.shl.com" + link
+            link = urljoin(page_url, link)
 
         remote_cell = row.find_all('td', class_='custom__table-heading__general')[0]
         remote_testing = "Yes" if remote_cell.find('span', class_='catalogue__circle -yes') else "No"
@@ -58,34 +159,112 @@ for url in urls:
 
         skills = ', '.join([type_skill_map.get(char, '') for char in type_string if char in type_skill_map])
 
-        try:
-            product_response = requests.get(link)
-            product_soup = BeautifulSoup(product_response.content, 'html.parser')
-            description_div = product_soup.find('div', class_='product-catalogue-training-calendar__row typ')
-            description = ""
-            duration = ""
-
-            if description_div:
-                p_tag = description_div.find('p')
-                if p_tag:
-                    full_text = p_tag.get_text(strip=True)
-                    description = full_text
-                    match = re.search(r'Approximate Completion Time in minutes\s*=\s*(\d+)', full_text)
-                    duration = match.group(1) if match else ""
-
-        except Exception as e:
-            description = "Error fetching description"
-            duration = ""
-
-        data.append([title, link, remote_testing, adaptive_irt, type_string, skills, description, duration])
-        time.sleep(0.5)
+        data.append([title, link, remote_testing, adaptive_irt, type_string, skills])
+    return soup, data
 
-csv_file = "shl_assessments_with_skills.csv"
-with open(csv_file, mode='w', newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerow([
-        "Name", "URL", "RemoteTesting", "AdaptiveSupport", "Type", "Skills", "Description", "Duration"
-    ])
-    writer.writerows(data)
-
-print(f"🎯 Data with skills saved to '{csv_file}'")
+
+def discover_pages(soup, page_url, catalog_type):
+    """Find links to further catalog pages of the same type on a listing page"""
+    pages = []
+    for a_tag in soup.find_all('a', href=True):
+        url = urljoin(page_url, a_tag['href'])
+        query = parse_qs(urlparse(url).query)
+        if "start" in query and set(query.get("type", [])) == {catalog_type}:
+            pages.append(url)
+    return pages
+
+
+def page_key(url):
+    """Catalog pages are identified by their start offset, whatever else is in the link"""
+    return int(parse_qs(urlparse(url).query).get("start", ["0"])[0])
+
+
+def parse_product_page(content):
+    """Extract the description and completion time from a product page"""
+    product_soup = BeautifulSoup(content, 'html.parser')
+    description_div = product_soup.find('div', class_='product-catalogue-training-calendar__row typ')
+    description = ""
+    duration = ""
+
+    if description_div:
+        p_tag = description_div.find('p')
+        if p_tag:
+            full_text = p_tag.get_text(strip=True)
+            description = full_text
+            match = re.search(r'Approximate Completion Time in minutes\s*=\s*(\d+)', full_text)
+            duration = match.group(1) if match else ""
+    return {"description": description, "duration": duration}
+
+
+def crawl_catalog(fetcher, first_url):
+    """Walk the catalog listing pages, discovering pagination as it goes"""
+    catalog_type = parse_qs(urlparse(first_url).query).get("type", ["2"])[0]
+    seen = {page_key(first_url)}
+    queue = [first_url]
+    pages = {}
+    while queue:
+        url = queue.pop(0)
+        content, _ = fetcher.fetch(url)
+        soup, rows = parse_catalog_rows(content, url)
+        pages[page_key(url)] = rows
+        for next_url in discover_pages(soup, url, catalog_type):
+            key = page_key(next_url)
+            if key not in seen:
+                seen.add(key)
+                queue.append(next_url)
+    # Keep the catalog order regardless of the order pages were discovered in
+    rows = []
+    for key in sorted(pages):
+        rows.extend(pages[key])
+    return rows
+
+
+def fetch_product(fetcher, link):
+    """Return (description, duration), re-parsing only product pages that changed"""
+    try:
+        content, changed = fetcher.fetch(link)
+        entry = fetcher.cache.get(link) or {}
+        parsed = entry.get("parsed")
+        if changed or parsed is None:
+            parsed = parse_product_page(content)
+            fetcher.cache.set_parsed(link, parsed)
+        return parsed["description"], parsed["duration"]
+    except Exception as e:
+        print(f"Error fetching {link}: {e}")
+        return "Error fetching description", ""
+
+
+def scrape(first_url=start_url, output=csv_file, cache_dir=".scrape_cache", concurrency=8, rate=4.0, burst=4):
+    cache = ResponseCache(cache_dir)
+    fetcher = Fetcher(cache, concurrency=concurrency, rate=rate, burst=burst)
+    started = time.perf_counter()
+
+    rows = crawl_catalog(fetcher, first_url)
+    print(f"Found {len(rows)} assessments")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        details = list(pool.map(lambda row: fetch_product(fetcher, row[1]), rows))
+    cache.save()
+
+    data = [row + list(detail) for row, detail in zip(rows, details)]
+    with open(output, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(csv_header)
+        writer.writerows(data)
+
+    elapsed = time.perf_counter() - started
+    print(f"Fetched {fetcher.stats['fetched']} changed pages, {fetcher.stats['not_modified'] + fetcher.stats['unchanged']} unchanged, in {elapsed:.1f}s")
+    print(f"🎯 Data with skills saved to '{output}'")
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the SHL product catalog into a CSV")
+    parser.add_argument("--start-url", default=start_url, help="first catalog listing page")
+    parser.add_argument("--output", default=csv_file)
+    parser.add_argument("--cache-dir", default=".scrape_cache", help="directory for cached responses")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel product page fetches")
+    parser.add_argument("--rate", type=float, default=4.0, help="requests per second")
+    parser.add_argument("--burst", type=int, default=4, help="requests allowed in a burst")
+    args = parser.parse_args()
+    scrape(args.start_url, args.output, args.cache_dir, args.concurrency, args.rate, args.burst)
@@ -0,0 +1,200 @@
+"""Versioned, read-only snapshots of the catalog and embedding matrix.
+
+A snapshot is a directory holding the catalog CSV, the normalized embedding
+matrix as a .npy file and the documents it indexes. Worker processes map the
+matrix read-only, so the operating system keeps one copy of it in the page
+cache for all of them, and they never open Chroma. `CURRENT` names the
+published version; it is replaced atomically, and workers that notice the
+change load the new version next to the old one before swapping it in, so
+in-flight requests finish on the objects they started with.
+
+    python snapshot.py build     # sync the vector store and publish a snapshot
+    python snapshot.py status
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import catalog
+from catalog import CatalogPayload
+from filters import CatalogIndex
+from lexical import BM25Index
+from vector import (
+    NumpyVectorIndex, SHLRetriever, embedding_model, get_embeddings, get_vector_store,
+    retriever_component, vector_store_component,
+)
+
+snapshot_root = os.environ.get("SHL_SNAPSHOT_DIR", "")
+# Snapshots kept on disk, so a worker that has not reloaded yet can still open its version
+snapshot_keep = int(os.environ.get("SHL_SNAPSHOT_KEEP", "2"))
+pointer_name = "CURRENT"
+
+
+def snapshot_version(catalog_bytes, matrix, documents):
+    digest = hashlib.sha256(catalog_bytes)
+    digest.update(np.ascontiguousarray(matrix).tobytes())
+    digest.update(json.dumps(documents, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# Publishes snapshots under a root directory and installs the current one in this process
+class SnapshotStore:
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.version = None
+        self.manifest = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def current_version(self):
+        """Version named by the CURRENT pointer, None before the first publish"""
+        try:
+            with open(os.path.join(self.root, pointer_name), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def publish(self):
+        """Write a snapshot of the catalog and vector store and point CURRENT at it"""
+        with open(catalog.catalog_path, "rb") as f:
+            catalog_bytes = f.read()
+        # Brings the store up to date with the catalog, embedding only changed rows
+        index = NumpyVectorIndex.from_chroma(get_vector_store(), None)
+        documents = {
+            "ids": [doc.id for doc in index.documents],
+            "contents": [doc.page_content for doc in index.documents],
+            "metadatas": [doc.metadata for doc in index.documents],
+        }
+        version = snapshot_version(catalog_bytes, index.matrix, documents)
+
+        os.makedirs(self.root, exist_ok=True)
+        if not os.path.isdir(self.path(version)):
+            # Build in a temporary directory and rename it, so a version directory is always complete
+            tmp_path = tempfile.mkdtemp(prefix=".build-", dir=self.root)
+            with open(os.path.join(tmp_path, "catalog.csv"), "wb") as f:
+                f.write(catalog_bytes)
+            np.save(os.path.join(tmp_path, "embeddings.npy"), np.ascontiguousarray(index.matrix, dtype=np.float32))
+            with open(os.path.join(tmp_path, "documents.json"), "w", encoding="utf-8") as f:
+                json.dump(documents, f, default=str)
+            manifest = {
+                "version": version,
+                "embedding_model": embedding_model,
+                "rows": len(index.documents),
+                "dimensions": int(index.matrix.shape[1]) if index.matrix.ndim == 2 else 0,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, self.path(version))
+
+        pointer_path = os.path.join(self.root, pointer_name)
+        with open(pointer_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer_path + ".tmp", pointer_path)
+        print(f"Published snapshot {version}")
+        self.prune(version)
+        return version
+
+    def prune(self, current):
+        versions = [
+            entry for entry in os.listdir(self.root)
+            if entry != current and not entry.startswith(".") and os.path.isfile(os.path.join(self.root, entry, "manifest.json"))
+        ]
+        versions.sort(key=lambda entry: os.path.getmtime(os.path.join(self.root, entry)), reverse=True)
+        for entry in versions[max(snapshot_keep - 1, 0):]:
+            # Processes that still map the old files keep them until they let go
+            shutil.rmtree(self.path(entry), ignore_errors=True)
+
+    def load(self, version):
+        """Build every catalog-derived object of a version without installing it"""
+        path = self.path(version)
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(path, "documents.json"), encoding="utf-8") as f:
+            documents = json.load(f)
+        df = pd.read_csv(os.path.join(path, "catalog.csv"))
+        matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        lexical = BM25Index(df)
+        catalog_index = CatalogIndex(df)
+        retriever = SHLRetriever(None, engine="numpy", df=df, lexical=lexical)
+        retriever.index = NumpyVectorIndex(
+            documents["ids"], matrix, documents["contents"], documents["metadatas"],
+            get_embeddings(), normalized=True,
+        )
+        return {
+            "manifest": manifest,
+            "catalog": df,
+            "catalog_index": catalog_index,
+            "lexical_index": lexical,
+            "catalog_payload": CatalogPayload(df, catalog_index),
+            "retriever": retriever,
+        }
+
+    def install(self, version, loaded):
+        catalog.catalog_component.set(loaded["catalog"])
+        catalog.catalog_index_component.set(loaded["catalog_index"])
+        catalog.lexical_index_component.set(loaded["lexical_index"])
+        catalog.catalog_payload_component.set(loaded["catalog_payload"])
+        retriever_component.set(loaded["retriever"])
+        # Searches run on the mapped matrix, Chroma is never opened
+        vector_store_component.set(None)
+        vector_store_component.detail = {"snapshot": version}
+        self.version = version
+        self.manifest = loaded["manifest"]
+        self.loaded_at = time.time()
+
+    def reload_if_changed(self):
+        """Install the published version if it differs from the installed one; returns it, or None"""
+        version = self.current_version()
+        if version is None or version == self.version:
+            return None
+        with self.lock:
+            if version == self.version:
+                return None
+            loaded = self.load(version)
+            self.install(version, loaded)
+            self.reloads += 1
+        print(f"Installed snapshot {version} in process {os.getpid()}")
+        return version
+
+    def status(self):
+        return {
+            "root": self.root,
+            "installed": self.version,
+            "current": self.current_version(),
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "manifest": self.manifest,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["build", "status"])
+    parser.add_argument("--root", default=snapshot_root or "snapshots", help="snapshot directory (default: SHL_SNAPSHOT_DIR or ./snapshots)")
+    args = parser.parse_args()
+    store = SnapshotStore(args.root)
+    if args.command == "build":
+        store.publish()
+    version = store.current_version()
+    if version is None:
+        print("No snapshot published")
+        return
+    with open(os.path.join(store.path(version), "manifest.json"), encoding="utf-8") as f:
+        print(json.dumps(json.load(f), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Track how long a fresh process takes from import to its first responses.
+
+Each run starts a new interpreter that imports main, starts the app in-process
+and times the first /healthz, /api/assessments and /readyz == 200 responses.
+
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --runs 5 --json startup.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def child(ready_timeout):
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    import asyncio
+    import httpx
+
+    async def probe():
+        timings = {"import": imported - started}
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.lifespan(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/healthz")
+                response.raise_for_status()
+                timings["first_healthz"] = time.perf_counter() - started
+                response = await client.get("/api/assessments")
+                response.raise_for_status()
+                timings["first_assessments"] = time.perf_counter() - started
+                deadline = time.perf_counter() + ready_timeout
+                while time.perf_counter() < deadline:
+                    response = await client.get("/readyz")
+                    if response.status_code == 200:
+                        timings["ready"] = time.perf_counter() - started
+                        break
+                    await asyncio.sleep(0.05)
+                timings["components"] = response.json()["components"]
+        return timings
+
+    print(json.dumps(asyncio.run(probe())))
+
+
+def summarize(runs, key):
+    values = [run[key] for run in runs if key in run]
+    if not values:
+        return None
+    return {"median": float(np.median(values)), "min": float(min(values)), "max": float(max(values))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="seconds to wait for /readyz")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.ready_timeout)
+        return
+
+    runs = []
+    for i in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--ready-timeout", str(args.ready_timeout)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        # The application prints progress, the timings are the last line
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {key: summarize(runs, key) for key in ("import", "first_healthz", "first_assessments", "ready")}
+    for key, stats in results.items():
+        if stats is None:
+            print(f"{key:>18}: not reached")
+        else:
+            print(f"{key:>18}: median {stats['median'] * 1000:.0f}ms (min {stats['min'] * 1000:.0f}ms, max {stats['max'] * 1000:.0f}ms)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": results, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
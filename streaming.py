@@ -0,0 +1,61 @@
+import json
+
+
+# Incremental parser that yields each recommendation object as soon as it closes
+class RecommendationStreamParser:
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        # Nesting depth of the recommendations array once it has opened, -1 after it closes
+        self.array_depth = None
+        self.item = None
+
+    def array_open(self):
+        return self.array_depth is not None and self.array_depth > 0
+
+    def feed(self, chunk):
+        """Consume a chunk of LLM output and return the objects completed by it"""
+        completed = []
+        for ch in chunk:
+            if self.item is not None:
+                self.item.append(ch)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                # Either {"recommendations": [ ... ]} or a bare top-level array
+                if ch == "[" and self.array_depth is None and self.depth <= 2:
+                    self.array_depth = self.depth
+                elif ch == "{" and self.item is None and self.array_open() and self.depth == self.array_depth + 1:
+                    self.item = ["{"]
+            elif ch in "}]":
+                if ch == "}" and self.item is not None and self.depth == self.array_depth + 1:
+                    try:
+                        value = json.loads("".join(self.item))
+                        if isinstance(value, dict):
+                            completed.append(value)
+                    except ValueError:
+                        pass
+                    self.item = None
+                elif ch == "]" and self.depth == self.array_depth:
+                    self.array_depth = -1
+                self.depth = max(self.depth - 1, 0)
+        return completed
+
+
+def format_event(event, data, fmt="sse"):
+    """Serialize one stream event as a server-sent event or an NDJSON line"""
+    if fmt == "ndjson":
+        return json.dumps({"event": event, "data": data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,130 @@
+import json
+from typing import List
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from streaming import RecommendationStreamParser
+
+max_recommendations = 10
+# Opening brackets tried as the start of the answer before salvaging items
+max_start_attempts = 8
+decoder = json.JSONDecoder()
+
+
+# One pick in a compact-prompt answer, naming a candidate by its short id
+class CompactRecommendation(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, coerce_numbers_to_str=True)
+
+    id: str = Field(min_length=1, max_length=16)
+    explanation: str = ""
+
+
+# One pick in a full-prompt answer, repeating the catalog fields
+class FullRecommendation(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, coerce_numbers_to_str=True)
+
+    name: str = Field(min_length=1)
+    url: str = ""
+    remote_testing: str = ""
+    adaptive_support: str = ""
+    duration: str = ""
+    type: str = ""
+    explanation: str = ""
+
+
+class CompactAnswer(BaseModel):
+    recommendations: List[CompactRecommendation] = Field(min_length=1, max_length=max_recommendations)
+
+
+class FullAnswer(BaseModel):
+    recommendations: List[FullRecommendation] = Field(min_length=1, max_length=max_recommendations)
+
+
+answer_models = {"compact": CompactAnswer, "full": FullAnswer}
+item_models = {"compact": CompactRecommendation, "full": FullRecommendation}
+
+
+def answer_schema(style):
+    """JSON schema that constrains the LLM's output for a prompt style"""
+    return answer_models[style].model_json_schema()
+
+
+def validate_item(item, style):
+    """The item as a plain dict if it fits the style's item model, else None"""
+    try:
+        return item_models[style].model_validate(item).model_dump()
+    except ValidationError:
+        return None
+
+
+def json_start(text, position):
+    """Position of the next "{" or "[" at or after position, -1 if there is none"""
+    starts = [found for found in (text.find("{", position), text.find("[", position)) if found != -1]
+    return min(starts) if starts else -1
+
+
+def is_answer(value):
+    return isinstance(value, list) or (isinstance(value, dict) and "recommendations" in value)
+
+
+def salvage_items(text):
+    """Complete recommendation objects from a truncated or malformed JSON answer"""
+    return RecommendationStreamParser().feed(text)
+
+
+def parse_answer(text, style="compact"):
+    """Parse and validate an LLM answer in one pass over the completion.
+
+    Returns (answer, outcome, dropped). `answer` is {"recommendations": [...]}
+    or None; `outcome` is "valid" when the whole answer fits the schema,
+    "repaired" when only some items were usable, or the failure reason
+    "invalid_json" or "missing_recommendations"; `dropped` counts items that
+    failed validation.
+    """
+    text = text if isinstance(text, str) else str(text)
+    # Skips any prose or code fence before the JSON; raw_decode ignores what follows it
+    first = start = json_start(text, 0)
+    if first == -1:
+        return None, "invalid_json", 0
+    value = None
+    first_decoded = False
+    for _ in range(max_start_attempts):
+        try:
+            candidate, end = decoder.raw_decode(text, start)
+        except ValueError:
+            start = json_start(text, start + 1)
+        else:
+            first_decoded = first_decoded or start == first
+            if is_answer(candidate):
+                value = candidate
+                break
+            # Braces in the prose, such as "{role}", are not the answer; never look inside a decoded value
+            start = json_start(text, end)
+        if start == -1:
+            break
+
+    if value is None:
+        if first_decoded:
+            return None, "missing_recommendations", 0
+        items = salvage_items(text[first:])
+        if not items:
+            return None, "invalid_json", 0
+        return repair(items, style, "invalid_json")
+
+    # A bare array of recommendations is accepted as well
+    items = value.get("recommendations") if isinstance(value, dict) else value
+    if not isinstance(items, list):
+        return None, "missing_recommendations", 0
+    try:
+        return answer_models[style].model_validate({"recommendations": items}).model_dump(), "valid", 0
+    except ValidationError:
+        return repair(items, style, "missing_recommendations")
+
+
+def repair(items, style, failure):
+    """Keep the items that validate on their own, at most max_recommendations of them"""
+    valid = [item for item in (validate_item(item, style) for item in items) if item is not None]
+    dropped = len(items) - len(valid)
+    if not valid:
+        return None, failure, dropped
+    return {"recommendations": valid[:max_recommendations]}, "repaired", dropped
@@ -0,0 +1,99 @@
+"""Stand-in for an Ollama host that answers slowly or fails on purpose.
+
+Implements the streaming /api/generate endpoint used by the recommendation
+chain and answers with the first candidate ids of the compact prompt, so the
+LLM pool's routing, deadlines and fallback can be exercised without a GPU.
+
+    python stub_llm_server.py --port 11501 --delay 0.5
+    python stub_llm_server.py --port 11502 --fail-rate 1.0
+    SHL_LLM_HOSTS=http://localhost:11501,http://localhost:11502 python main.py
+"""
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_answer(prompt, picks=5):
+    ids = re.findall(r"^(A\d+) \|", prompt, flags=re.MULTILINE)[:picks]
+    items = [{"id": candidate_id, "explanation": "Stub backend pick"} for candidate_id in ids]
+    return json.dumps({"recommendations": items})
+
+
+def make_handler(args):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_error(404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+            if random.random() < args.fail_rate:
+                # Ollama reports errors as a JSON object
+                body = json.dumps({"error": "Simulated backend failure"}).encode("utf-8")
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            time.sleep(args.delay)
+
+            answer = stub_answer(request.get("prompt", ""))
+            pieces = [answer[i:i + args.chunk_chars] for i in range(0, len(answer), args.chunk_chars)]
+            lines = [{"model": request.get("model"), "response": piece, "done": False} for piece in pieces]
+            lines.append({"model": request.get("model"), "response": "", "done": True, "done_reason": "stop"})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for line in lines:
+                    line["created_at"] = datetime.now(timezone.utc).isoformat()
+                    data = (json.dumps(line) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(args.chunk_delay)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading, e.g. after a deadline
+                self.close_connection = True
+
+    return StubHandler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="characters per streamed chunk")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--verbose", action="store_true")
+    return parser
+
+
+def stub_options(**values):
+    """Options for a stub run in-process: the command-line defaults, overridden by values"""
+    return argparse.Namespace(**{**vars(build_parser().parse_args([])), **values})
+
+
+def main():
+    args = build_parser().parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Stub LLM listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from cache import CachedEmbeddings
+from catalog import get_catalog, get_lexical_index
+from components import LazyComponent
+from metrics import timed, fallback_total
 import os
-import pandas as pd
+import json
+import hashlib
 import numpy as np
 
-# Create embeddings
-embeddings = OllamaEmbeddings(model="mxbai-embed-large")
-
+embedding_model = "mxbai-embed-large"
 db_location = "./chrome_shl_db"
-add_documents = not os.path.exists(db_location)
+collection_name = "shl_assessments"
+# Records the embedding model and the content hash of every stored document
+manifest_path = os.path.join(db_location, "manifest.json")
+# "chroma" queries the persisted store on every call, "numpy" answers from an in-memory matrix
+vector_engine = os.environ.get("SHL_VECTOR_ENGINE", "chroma")
+# "hybrid" fuses vector and BM25 rankings, "vector" and "lexical" use one of them alone
+retrieval_mode = os.environ.get("SHL_RETRIEVAL_MODE", "hybrid")
+retrieval_k = int(os.environ.get("SHL_RETRIEVAL_K", "10"))
+fusion_depth = int(os.environ.get("SHL_FUSION_DEPTH", "30"))
+rrf_k = 60
 
 # Function to create a more comprehensive document text
 def create_assessment_text(row):
@@ -31,115 +41,364 @@ def create_assessment_text(row):
     {row['Description']}
     """
 
-if add_documents:
-    try:
-        # Load SHL assessment data
-        df = pd.read_csv("shl_assessments_with_skills.csv")
-        documents = []
-        ids = []
-        
-        for i, row in df.iterrows():
-            # Create document with comprehensive assessment details
-            assessment_text = create_assessment_text(row)
-            
-            document = Document(
-                page_content=assessment_text,
-                metadata={
-                    "name": row["Name"],
-                    "type": row["Type"],
-                    "skills": row["Skills"],
-                    "description": row["Description"],
-                    "duration": row["Duration"],
-                    "remote_testing": row["RemoteTesting"],
-                    "adaptive_support": row["AdaptiveSupport"],
-                    "url": row["URL"]
-                },
-                id=str(i)
-            )
-            ids.append(str(i))
-            documents.append(document)
-            
-        print(f"Creating vector store with {len(documents)} documents")
-        vector_store = Chroma(
-            collection_name="shl_assessments",
-            persist_directory=db_location,
-            embedding_function=embeddings
-        )
-        
-        # Add documents in batches to avoid memory issues
-        batch_size = 50
-        for i in range(0, len(documents), batch_size):
-            end = min(i + batch_size, len(documents))
-            vector_store.add_documents(documents=documents[i:end], ids=ids[i:end])
-            print(f"Added documents {i} to {end-1}")
-        
-        # Persist after adding all documents
-        vector_store.persist()
-        print("Vector store created and persisted successfully")
-    except Exception as e:
-        print(f"Error creating vector store: {e}")
-        # Create an empty directory to prevent repeated attempts
-        if not os.path.exists(db_location):
-            os.makedirs(db_location)
-else:
-    print("Using existing vector store")
-    # Load the existing vector store
-    vector_store = Chroma(
-        collection_name="shl_assessments",
-        persist_directory=db_location,
-        embedding_function=embeddings
+def create_assessment_document(row, doc_id):
+    """Build the Document stored for one catalog row"""
+    return Document(
+        page_content=create_assessment_text(row),
+        metadata={
+            "name": row["Name"],
+            "type": row["Type"],
+            "skills": row["Skills"],
+            "description": row["Description"],
+            "duration": row["Duration"],
+            "remote_testing": row["RemoteTesting"],
+            "adaptive_support": row["AdaptiveSupport"],
+            "url": row["URL"]
+        },
+        id=doc_id
     )
 
-# Custom retriever with fallback
+def assessment_id(row):
+    """Stable document id derived from the assessment URL"""
+    return hashlib.sha1(str(row["URL"]).encode("utf-8")).hexdigest()[:16]
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(path, manifest):
+    # Write to a temporary file first so a crash never leaves a truncated manifest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def sync_vector_store(vector_store, df, manifest_path, batch_size=50):
+    """Embed only new or changed catalog rows and delete removed ones"""
+    manifest = load_manifest(manifest_path)
+    stored_ids = set(vector_store.get(include=[])["ids"])
+    same_model = manifest.get("embedding_model") == embedding_model
+    if same_model:
+        # Only trust hashes for documents that are actually in the store
+        stored_hashes = {
+            doc_id: digest
+            for doc_id, digest in manifest.get("documents", {}).items()
+            if doc_id in stored_ids
+        }
+    else:
+        if stored_ids:
+            previous = manifest.get("embedding_model", "an unrecorded model")
+            print(f"Stored embeddings come from {previous}, re-embedding all documents with {embedding_model}")
+        stored_hashes = {}
+
+    current_hashes = {}
+    changed = []
+    for _, row in df.iterrows():
+        document = create_assessment_document(row, assessment_id(row))
+        digest = content_hash(document.page_content)
+        current_hashes[document.id] = digest
+        if stored_hashes.get(document.id) != digest:
+            changed.append(document)
+
+    # Also removes ids from older builds, such as the positional ids of the original rebuild
+    removed = sorted(stored_ids - set(current_hashes) if same_model else stored_ids)
+    if removed:
+        vector_store.delete(ids=removed)
+        print(f"Removed {len(removed)} documents")
+    for doc_id in removed:
+        stored_hashes.pop(doc_id, None)
+
+    manifest = {
+        "embedding_model": embedding_model,
+        "collection": collection_name,
+        "documents": stored_hashes,
+    }
+    # Add documents in batches and checkpoint the manifest after each one
+    for i in range(0, len(changed), batch_size):
+        batch = changed[i:i + batch_size]
+        vector_store.add_documents(documents=batch, ids=[doc.id for doc in batch])
+        for doc in batch:
+            stored_hashes[doc.id] = current_hashes[doc.id]
+        save_manifest(manifest_path, manifest)
+        print(f"Embedded documents {i} to {i + len(batch) - 1}")
+    save_manifest(manifest_path, manifest)
+
+    if changed or removed:
+        print(f"Vector store synced: {len(changed)} embedded, {len(removed)} removed, {len(current_hashes)} total")
+    else:
+        print("Using existing vector store")
+    return {"embedded": len(changed), "removed": len(removed), "total": len(current_hashes)}
+
+# In-memory index over the embeddings already stored in Chroma
+class NumpyVectorIndex:
+    def __init__(self, ids, vectors, contents, metadatas, embedding_function, normalized=False):
+        if normalized:
+            # Used as given, so a read-only memory-mapped matrix stays shared between processes
+            self.matrix = vectors
+        else:
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+            # Normalize rows once so a dot product is the cosine similarity
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = np.ascontiguousarray(matrix / norms)
+        self.documents = [
+            Document(page_content=content, metadata=metadata, id=doc_id)
+            for doc_id, content, metadata in zip(ids, contents, metadatas)
+        ]
+        self.embedding_function = embedding_function
+
+    @classmethod
+    def from_chroma(cls, vector_store, embedding_function):
+        """Load every stored embedding from a Chroma collection"""
+        data = vector_store.get(include=["embeddings", "documents", "metadatas"])
+        vectors = data["embeddings"] if data["embeddings"] is not None else []
+        return cls(data["ids"], vectors, data["documents"], data["metadatas"], embedding_function)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _top_k(self, scores, k):
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def score_all(self, query_vector):
+        """Cosine score of every stored document against one query embedding"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        return self.matrix @ query
+
+    def search_by_vector(self, query_vector, k=10):
+        """Return (row index, cosine score) pairs for one query embedding"""
+        if len(self) == 0:
+            return []
+        scores = self.score_all(query_vector)
+        return [(int(i), float(scores[i])) for i in self._top_k(scores, k)]
+
+    def search_many_by_vector(self, query_vectors, k=10):
+        """Score a batch of query embeddings with a single matrix product"""
+        if len(self) == 0 or len(query_vectors) == 0:
+            return [[] for _ in query_vectors]
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ self.matrix.T
+        return [
+            [(int(i), float(row[i])) for i in self._top_k(row, k)]
+            for row in scores
+        ]
+
+    def invoke(self, query, k=10):
+        with timed("embed"):
+            query_vector = self.embedding_function.embed_query(query)
+        with timed("search"):
+            return [self.documents[i] for i, _ in self.search_by_vector(query_vector, k)]
+
+    def invoke_many(self, queries, k=10):
+        with timed("embed"):
+            query_vectors = self.embedding_function.embed_documents(list(queries))
+        with timed("search"):
+            return [
+                [self.documents[i] for i, _ in hits]
+                for hits in self.search_many_by_vector(query_vectors, k)
+            ]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merge ranked key lists; a key scores the sum of 1 / (k + rank) over the lists it appears in"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    # Stable sort, so ties keep the order of the first ranking
+    return sorted(scores, key=lambda key: -scores[key])
+
+# Custom retriever fusing vector and BM25 rankings, with a lexical fallback
 class SHLRetriever:
-    def __init__(self, vector_store, k=10):
+    def __init__(self, vector_store, k=None, engine=None, df=None, lexical=None, mode=None):
         self.vector_store = vector_store
-        self.k = k
-        # Load full dataset for fallback
-        try:
-            self.df = pd.read_csv("shl_assessments_with_skills.csv")
-        except:
-            self.df = None
+        self.k = k or retrieval_k
+        self.engine = engine or vector_engine
+        self.mode = mode or retrieval_mode
+        self.index = None
+        # Full dataset and its BM25 index, for fusion and fallback
+        self.df = df
+        self.lexical = lexical
+        self.catalog_documents = None
+
+    def get_index(self):
+        """Build the in-memory index on first use"""
+        if self.index is None:
+            self.index = NumpyVectorIndex.from_chroma(self.vector_store, get_embeddings())
+            print(f"Loaded {len(self.index)} embeddings into the in-memory index")
+        return self.index
+
+    def search_depth(self):
+        # Fusion needs deeper lists than k, or documents ranked just below k by both signals are lost
+        return max(self.k, fusion_depth) if self.mode == "hybrid" else self.k
+
+    def catalog_document(self, position):
+        # Built once, so lexical hits cost a list lookup instead of a DataFrame row access
+        if self.catalog_documents is None:
+            self.catalog_documents = [create_assessment_document(row, assessment_id(row)) for _, row in self.df.iterrows()]
+        return self.catalog_documents[position]
+
+    def vector_search(self, query, depth):
+        if self.engine == "numpy":
+            return self.get_index().invoke(query, depth)
+        # Embed separately from the Chroma query so each stage is timed on its own
+        with timed("embed"):
+            query_vector = self.vector_store.embeddings.embed_query(query)
+        with timed("search"):
+            return self.vector_store.similarity_search_by_vector(query_vector, k=depth)
+
+    def lexical_search(self, query, depth):
+        if self.lexical is None or self.df is None:
+            return []
+        with timed("lexical"):
+            hits = self.lexical.search(query, depth)
+        return [self.catalog_document(position) for position, _ in hits]
+
+    def combine(self, query, vector_docs):
+        """Fuse vector hits with BM25 hits in hybrid mode and cut the result to k"""
+        if self.mode == "hybrid":
+            lexical_docs = self.lexical_search(query, self.search_depth())
+            # Prefer the stored documents, lexical-only hits are rebuilt from the catalog
+            by_url = {doc.metadata.get("url"): doc for doc in lexical_docs + vector_docs}
+            ranking = reciprocal_rank_fusion([
+                [doc.metadata.get("url") for doc in vector_docs],
+                [doc.metadata.get("url") for doc in lexical_docs],
+            ], rrf_k)
+            vector_docs = [by_url[url] for url in ranking]
+        return vector_docs[:self.k] or self.fallback_documents(query)
 
     def invoke(self, query):
-        # First try vector store retrieval
+        if self.mode == "lexical":
+            return self.lexical_search(query, self.k) or self.fallback_documents()
+        try:
+            docs = self.vector_search(query, self.search_depth())
+        except Exception as e:
+            print(f"Vector retrieval error: {e}")
+            return self.fallback_documents(query)
+        return self.combine(query, docs)
+
+    def invoke_many(self, queries):
+        """Retrieve documents for several queries with one embedding call and one matrix search.
+
+        Always uses the in-memory index, whatever the configured engine, since
+        per-query Chroma round trips are what batching is meant to avoid.
+        """
+        queries = list(queries)
+        if self.mode == "lexical":
+            return [self.invoke(query) for query in queries]
         try:
-            docs = self.vector_store.as_retriever(search_kwargs={"k": self.k}).invoke(query)
-            if docs and len(docs) > 0:
-                return docs
+            results = self.get_index().invoke_many(queries, self.search_depth())
         except Exception as e:
             print(f"Vector retrieval error: {e}")
-        
-        # Fallback: return random documents if vector retrieval fails or returns empty
-        if self.df is not None:
-            print("Using fallback retrieval")
-            sample_indices = np.random.choice(len(self.df), min(self.k, len(self.df)), replace=False)
-            documents = []
-            
-            for idx in sample_indices:
-                row = self.df.iloc[idx]
-                assessment_text = create_assessment_text(row)
-                
-                document = Document(
-                    page_content=assessment_text,
-                    metadata={
-                        "name": row["Name"],
-                        "type": row["Type"],
-                        "skills": row["Skills"],
-                        "description": row["Description"],
-                        "duration": row["Duration"],
-                        "remote_testing": row["RemoteTesting"],
-                        "adaptive_support": row["AdaptiveSupport"],
-                        "url": row["URL"]
-                    },
-                    id=str(idx)
-                )
-                documents.append(document)
-            
+            return [self.fallback_documents(query) for query in queries]
+        return [self.combine(query, docs) for query, docs in zip(queries, results)]
+
+    def lexical_scores(self, query):
+        return self.lexical.scores_by_url(query) if self.lexical is not None else {}
+
+    def score_by_url(self, query):
+        """Vector score of every indexed assessment keyed by URL, BM25 scores if embedding fails"""
+        if self.mode == "lexical":
+            return self.lexical_scores(query)
+        try:
+            index = self.get_index()
+            if len(index):
+                with timed("embed"):
+                    query_vector = index.embedding_function.embed_query(query)
+                with timed("search"):
+                    scores = index.score_all(query_vector)
+            else:
+                scores = []
+        except Exception as e:
+            print(f"Vector retrieval error: {e}")
+            return self.lexical_scores(query)
+        return {
+            doc.metadata.get("url"): float(score)
+            for doc, score in zip(index.documents, scores)
+        }
+
+    def fallback_documents(self, query=None):
+        # Fallback when vector retrieval fails or returns nothing: rank the catalog lexically
+        if self.df is None:
+            # Last resort: return an empty list
+            return []
+        documents = self.lexical_search(query, self.k) if query else []
+        if documents:
+            print("Using lexical fallback retrieval")
+            fallback_total.inc("lexical_retrieval")
             return documents
-        
-        # Last resort: return an empty list
-        return []
+        print("Using fallback retrieval")
+        fallback_total.inc("catalog_order")
+        return [self.catalog_document(position) for position in range(min(self.k, len(self.df)))]
+
+def create_embeddings():
+    """Create embeddings, cached by normalized text so repeated queries skip the Ollama call"""
+    from langchain_ollama import OllamaEmbeddings
+    return CachedEmbeddings(
+        OllamaEmbeddings(model=embedding_model),
+        model_name=embedding_model,
+        max_entries=int(os.environ.get("SHL_EMBED_CACHE_SIZE", "1024")),
+        ttl=float(os.environ.get("SHL_EMBED_CACHE_TTL", "0")) or None,
+        disk_path=os.environ.get("SHL_EMBED_CACHE_PATH") or None,
+    )
+
+def open_vector_store():
+    """Open the persistent store and bring it up to date with the catalog"""
+    # chromadb is slow to import, so only pay for it when the store is first used
+    from langchain_chroma import Chroma
+    vector_store = Chroma(
+        collection_name=collection_name,
+        persist_directory=db_location,
+        embedding_function=get_embeddings()
+    )
+    try:
+        vector_store_component.detail = sync_vector_store(vector_store, get_catalog(), manifest_path)
+    except Exception as e:
+        # The store is still usable with whatever it already holds
+        print(f"Error syncing vector store: {e}")
+        vector_store_component.detail = {"sync_error": str(e)}
+    return vector_store
+
+def create_retriever():
+    try:
+        df = get_catalog()
+        lexical = get_lexical_index()
+    except Exception as e:
+        print(f"Error loading catalog for lexical retrieval: {e}")
+        df = None
+        lexical = None
+    return SHLRetriever(get_vector_store(), df=df, lexical=lexical)
+
+# Components are built on first use rather than at import time
+embeddings_component = LazyComponent("embeddings", create_embeddings)
+vector_store_component = LazyComponent("vector_store", open_vector_store)
+retriever_component = LazyComponent("retriever", create_retriever)
+
+def get_embeddings():
+    return embeddings_component.get()
+
+def get_vector_store():
+    return vector_store_component.get()
+
+def get_retriever():
+    return retriever_component.get()
 
-# Create the retriever instance
-retriever = SHLRetriever(vector_store)
\ No newline at end of file
+if __name__ == "__main__":
+    # Build or sync the vector database
+    get_vector_store()
@@ -0,0 +1,96 @@
+"""Check that the in-memory NumPy index returns the same top-k as Chroma.
+
+Embeds every query once and compares NumpyVectorIndex.search_by_vector with
+Chroma's similarity_search_by_vector over the same stored embeddings of the
+bundled CSV. Documents whose scores tie at the k-th place may swap in and out
+of the cut; any other difference is a mismatch and the script exits 1.
+The default `fake` backend builds a temporary Chroma collection with the
+deterministic embeddings of benchmark.py, so it runs without Ollama;
+`--backend ollama` checks the real vector store.
+
+    python vector_parity.py
+    python vector_parity.py --backend ollama -k 5 10 20
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+# Cosine scores closer than this count as ties
+tie_tolerance = 1e-5
+
+
+def open_store(backend):
+    """Return (Chroma store, embedding function, cleanup callback)"""
+    import vector
+    from catalog import get_catalog
+
+    if backend == "ollama":
+        return vector.get_vector_store(), vector.get_embeddings().embedding_function, lambda: None
+
+    from langchain_chroma import Chroma
+    from benchmark import FakeEmbeddings
+
+    directory = tempfile.mkdtemp(prefix="vector-parity-")
+    embeddings = FakeEmbeddings()
+    store = Chroma(collection_name=vector.collection_name, persist_directory=directory, embedding_function=embeddings)
+    vector.sync_vector_store(store, get_catalog(), f"{directory}/manifest.json")
+    return store, embeddings, lambda: shutil.rmtree(directory, ignore_errors=True)
+
+
+def compare(index, store, query_vector, k):
+    """Return a mismatch description, or None when both engines agree"""
+    hits = index.search_by_vector(query_vector, k)
+    numpy_ids = [index.documents[row].id for row, _ in hits]
+    chroma_ids = [doc.id for doc in store.similarity_search_by_vector(query_vector, k=k)]
+    if numpy_ids == chroma_ids:
+        return None
+
+    scores = dict(zip([doc.id for doc in index.documents], index.score_all(query_vector).tolist()))
+    cutoff = scores[numpy_ids[-1]] if numpy_ids else 0.0
+    # Order may only differ between tied scores, and only tied documents may swap across the cut
+    for numpy_id, chroma_id in zip(numpy_ids, chroma_ids):
+        if numpy_id != chroma_id and abs(scores[numpy_id] - scores.get(chroma_id, -np.inf)) > tie_tolerance:
+            break
+    else:
+        swapped = set(numpy_ids) ^ set(chroma_ids)
+        if len(numpy_ids) == len(chroma_ids) and all(abs(scores[doc_id] - cutoff) <= tie_tolerance for doc_id in swapped):
+            return None
+    return {"numpy": numpy_ids, "chroma": chroma_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="fake", choices=["fake", "ollama"])
+    parser.add_argument("--queries", default="benchmark_queries.jsonl", help="JSONL file with a query per line")
+    parser.add_argument("-k", type=int, nargs="+", default=[1, 5, 10, 30])
+    args = parser.parse_args()
+
+    from vector import NumpyVectorIndex
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    store, embeddings, cleanup = open_store(args.backend)
+    try:
+        index = NumpyVectorIndex.from_chroma(store, embeddings)
+        query_vectors = embeddings.embed_documents(queries)
+        mismatches = []
+        for query, query_vector in zip(queries, query_vectors):
+            for k in args.k:
+                mismatch = compare(index, store, query_vector, k)
+                if mismatch is not None:
+                    mismatches.append({"query": query, "k": k, **mismatch})
+    finally:
+        cleanup()
+
+    checks = len(queries) * len(args.k)
+    print(json.dumps({"documents": len(index), "checks": checks, "mismatches": mismatches}, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Resident memory per worker of the multi-worker server.
+
+Starts `main.py serve --workers N` for each requested worker count, waits
+until the workers report ready, sends a few requests so lazily built
+objects exist, and reads RSS and PSS of every worker from /proc (Linux
+only). PSS splits shared pages, such as the memory-mapped embedding matrix,
+between the processes that map them, so the growth of total PSS is what one
+more worker really costs.
+
+    python worker_memory.py --workers 1 2 4
+    python worker_memory.py --workers 1 4 --compare   # also without snapshots
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def memory_kb(pid):
+    """(RSS, PSS) of a process in KiB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0])
+    return values["Rss"], values["Pss"]
+
+
+def child_pids(pid):
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children", encoding="ascii") as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def worker_pids(pid):
+    workers = []
+    for child in child_pids(pid):
+        with open(f"/proc/{child}/cmdline", "rb") as f:
+            cmdline = f.read()
+        # multiprocessing's resource tracker is not a worker
+        if b"resource_tracker" not in cmdline:
+            workers.append(child)
+    return workers
+
+
+def wait_ready(base_url, workers, timeout):
+    """Wait until enough consecutive /readyz calls, spread over the workers, return 200"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(f"{base_url}/readyz", timeout=5)
+            streak = streak + 1 if response.status_code == 200 else 0
+        except httpx.HTTPError:
+            streak = 0
+        if streak >= 5 * workers:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def measure(workers, port, env, requests, timeout):
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_ready(base_url, workers, timeout):
+            raise RuntimeError(f"{workers} workers did not become ready within {timeout}s")
+        for i in range(requests):
+            httpx.get(f"{base_url}/api/assessments", params={"limit": 20}, timeout=30)
+            httpx.get(f"{base_url}/api/recommend", params={"query": f"java developer {i}", "mode": "fast"}, timeout=30)
+        time.sleep(1)
+        # A single worker is served by the main process itself
+        pids = worker_pids(process.pid) if workers > 1 else [process.pid]
+        usage = [memory_kb(pid) for pid in pids]
+        return {
+            "workers": workers,
+            "rss_mb": [round(rss / 1024, 1) for rss, _ in usage],
+            "pss_mb": [round(pss / 1024, 1) for _, pss in usage],
+            "total_pss_mb": round(sum(pss for _, pss in usage) / 1024, 1),
+        }
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run(label, counts, port, env, requests, timeout):
+    rows = [measure(count, port, env, requests, timeout) for count in counts]
+    first, last = rows[0], rows[-1]
+    added = last["workers"] - first["workers"]
+    summary = {"mode": label, "runs": rows}
+    if added > 0:
+        summary["pss_mb_per_added_worker"] = round((last["total_pss_mb"] - first["total_pss_mb"]) / added, 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--requests", type=int, default=10, help="requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for the workers to become ready")
+    parser.add_argument("--compare", action="store_true", help="also measure workers that each open the vector store")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    counts = sorted(set(args.workers))
+    env = dict(os.environ)
+    env.setdefault("SHL_SNAPSHOT_DIR", "snapshots")
+    # Publish up front, so no measured process pays for opening the vector store
+    subprocess.run([sys.executable, "snapshot.py", "build", "--root", env["SHL_SNAPSHOT_DIR"]], env=env, check=True, stdout=subprocess.DEVNULL)
+    results = [run("snapshot", counts, args.port, env, args.requests, args.timeout)]
+    if args.compare:
+        results.append(run("vector_store", counts, args.port, {**env, "SHL_SNAPSHOT_DIR": "", "SHL_VECTOR_ENGINE": "numpy"}, args.requests, args.timeout))
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()